@@ -4,6 +4,15 @@ Health check endpoints
 from fastapi import APIRouter
 from datetime import datetime
 
+from app.core.auth import api_key_cache, firebase_token_cache, user_cache
+from app.core.usage import usage_recorder
+from app.core.offload import auth_pool
+from app.core.embeddings import embedding_stats
+from app.core.jobs import ingestion_workers
+from app.core.prefilter import worthiness_prefilter
+from app.core.admission import llm_pool, embedding_pool
+from app.core.resilience import llm_resilience, embedding_resilience
+
 router = APIRouter()
 
 
@@ -16,3 +25,26 @@ async def health_check():
         "service": "UniMemory API"
     }
 
+
+
+@router.get("/health/stats")
+async def health_stats():
+    """In-process cache and queue counters"""
+    return {
+        "api_key_cache": api_key_cache.stats(),
+        "firebase_token_cache": firebase_token_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "api_key_usage": usage_recorder.stats(),
+        "auth_pool": auth_pool.stats(),
+        "embeddings": embedding_stats(),
+        "ingestion_workers": ingestion_workers.stats(),
+        "prefilter": worthiness_prefilter.stats(),
+        "admission": {
+            "llm": llm_pool.stats(),
+            "embeddings": embedding_pool.stats()
+        },
+        "providers": {
+            "llm": llm_resilience.stats(),
+            "embeddings": embedding_resilience.stats()
+        }
+    }
@@ -0,0 +1,64 @@
+"""
+Ingestion job status endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Optional, Dict, Any
+from pydantic import BaseModel
+
+from app.db.database import get_db
+from app.db.models import IngestionJob
+from app.core.auth import validate_api_key
+
+router = APIRouter()
+
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    progress: Optional[Dict[str, Any]]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    attempts: int
+    created_at: str
+    started_at: Optional[str]
+    finished_at: Optional[str]
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    user_info: tuple = Depends(validate_api_key),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Get the status of an asynchronous /memories/add job.
+    
+    Requires X-API-Key header for authentication.
+    Only returns jobs owned by the authenticated user.
+    """
+    user, api_key = user_info
+    owner_id = str(user.id)
+    
+    stmt = select(IngestionJob).where(
+        IngestionJob.id == job_id,
+        IngestionJob.owner_id == owner_id
+    )
+    result = await session.execute(stmt)
+    job = result.scalar_one_or_none()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or not authorized")
+    
+    return JobResponse(
+        id=str(job.id),
+        status=job.status,
+        progress=job.progress,
+        result=job.result,
+        error=job.error,
+        attempts=job.attempts or 0,
+        created_at=job.created_at.isoformat(),
+        started_at=job.started_at.isoformat() if job.started_at else None,
+        finished_at=job.finished_at.isoformat() if job.finished_at else None
+    )
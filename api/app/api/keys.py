@@ -10,8 +10,9 @@ from datetime import datetime
 
 from app.db.database import get_db
 from app.db.models import User, APIKey
-from app.core.auth import get_current_user
-from app.core.security import generate_api_key
+from app.core.auth import get_current_user, invalidate_api_key
+from app.core.security import generate_api_key, digest_api_key
+from app.core.offload import auth_pool
 
 router = APIRouter(prefix="/keys", tags=["api-keys"])
 
@@ -47,13 +48,14 @@ async def create_api_key(
     session: AsyncSession = Depends(get_db)
 ):
     """Create a new API key for the user"""
-    # Generate key
-    plaintext_key, hashed_key = generate_api_key()
+    # Generate key (bcrypt runs in the auth thread pool)
+    plaintext_key, hashed_key = await auth_pool.run(generate_api_key)
     key_prefix = plaintext_key[:15] + "..."
     
     api_key = APIKey(
         name=data.name,
         key_hash=hashed_key,
+        key_digest=digest_api_key(plaintext_key),
         key_prefix=key_prefix,
         user_id=user.id,
         expires_at=data.expires_at
@@ -134,3 +136,6 @@ async def revoke_api_key(
     # Delete the key from the database
     await session.delete(api_key)
     await session.commit()
+    
+    # Stop honouring cached verifications of this key
+    invalidate_api_key(api_key.key_digest)
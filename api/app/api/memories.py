@@ -1,20 +1,16 @@
 """
 Memory management endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from pydantic import BaseModel
-import uuid
 
 from app.db.database import get_db
-from app.db.models import Memory, Waypoint, ProcessingLog, User
-from app.core.extractor import get_extractor
-from app.core.embeddings import get_embedding_service
-from app.core.simhash import compute_simhash, hamming_distance
-from app.core.sector import classify_sector, get_sector_decay_lambda, calculate_initial_salience
-from app.core.waypoints import create_waypoint_for_memory
+from app.db.models import Memory, Waypoint, User
+from app.core.ingest import ingest_memory, ingest_batch
+from app.core.jobs import enqueue_ingestion
 from app.core.auth import validate_api_key
 from app.config import settings
 
@@ -27,6 +23,18 @@ class AddMemoryRequest(BaseModel):
     source_app: Optional[str] = None
     user_id: Optional[str] = "anonymous"
     metadata: Optional[Dict[str, Any]] = None
+    async_mode: Optional[bool] = False  # Return 202 + job_id and process in the background
+
+
+class BatchMemoryItem(BaseModel):
+    content: str
+    source_app: Optional[str] = None
+    user_id: Optional[str] = "anonymous"
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class BatchMemoryRequest(BaseModel):
+    items: List[BatchMemoryItem]
 
 
 class MemoryResponse(BaseModel):
@@ -51,6 +59,7 @@ class MemoryListResponse(BaseModel):
 @router.post("/memories/add", response_model=Dict[str, Any])
 async def add_memory(
     request: AddMemoryRequest,
+    response: Response,
     user_info: tuple = Depends(validate_api_key),
     session: AsyncSession = Depends(get_db)
 ):
@@ -59,6 +68,9 @@ async def add_memory(
     
     Requires X-API-Key header for authentication.
     
+    With async_mode=true the request is queued and answered with 202 and a
+    job_id; poll GET /jobs/{job_id} for progress and the result.
+    
     Flow:
     1. Check if worth remembering (LLM)
     2. Extract structured memories (LLM)
@@ -74,161 +86,59 @@ async def add_memory(
     if not content:
         raise HTTPException(status_code=400, detail="Content cannot be empty")
     
-    extractor = get_extractor()
-    embedding_service = get_embedding_service()
-    
-    # Step 1: Check worthiness
-    worthiness = await extractor.check_worthiness(content)
-    if not worthiness.get("is_worth_remembering", False):
-        # Log as not worth remembering
-        log = ProcessingLog(
-            id=str(uuid.uuid4()),
-            raw_content_hash=compute_simhash(content),
-            processed_at=datetime.utcnow(),
-            was_worth_remembering=False,
-            reason=worthiness.get("reason", "Not worth remembering"),
-            extracted_count=0
-        )
-        session.add(log)
-        await session.commit()
-        
-        return {
-            "was_worth_remembering": False,
-            "reason": worthiness.get("reason"),
-            "extracted_count": 0
-        }
+    if request.async_mode:
+        job = await enqueue_ingestion(session, owner_id, {
+            "content": content,
+            "source_app": request.source_app,
+            "user_id": request.user_id,
+            "metadata": request.metadata
+        })
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {"job_id": str(job.id), "status": job.status}
+    
+    return await ingest_memory(
+        session=session,
+        owner_id=owner_id,
+        content=content,
+        source_app=request.source_app,
+        user_id=request.user_id,
+        metadata=request.metadata
+    )
+
+
+@router.post("/memories/batch", response_model=Dict[str, Any])
+async def add_memories_batch(
+    request: BatchMemoryRequest,
+    user_info: tuple = Depends(validate_api_key),
+    session: AsyncSession = Depends(get_db)
+):
+    """
+    Add many memories in one request
     
-    # Step 2: Extract memories
-    extracted = await extractor.extract_memories(content)
-    if not extracted:
-        return {
-            "was_worth_remembering": True,
-            "reason": "Worth remembering but extraction failed",
-            "extracted_count": 0
-        }
+    Requires X-API-Key header for authentication.
     
-    # Step 3: Process each extracted memory
-    saved_memories = []
+    Runs the same pipeline as /memories/add, batched across items.
+    Returns {"results": [...]} with one /memories/add-style result per
+    item, in request order.
+    """
+    user, api_key = user_info
+    owner_id = str(user.id)
     
-    for mem_data in extracted:
-        # Handle both dict format {"content": "..."} and plain string format
-        if isinstance(mem_data, str):
-            mem_content = mem_data.strip()
-        elif isinstance(mem_data, dict):
-            mem_content = mem_data.get("content", "").strip()
-        else:
-            continue
-            
-        if not mem_content:
-            continue
-        
-        # Generate SimHash for deduplication
-        simhash = compute_simhash(mem_content)
-        
-        # Check for existing similar memory (scoped to owner and end-user)
-        from sqlalchemy import select
-        stmt = select(Memory).where(
-            Memory.simhash.isnot(None),
-            Memory.is_active == True,
-            Memory.owner_id == owner_id,
-            Memory.user_id == request.user_id
-        ).order_by(Memory.salience.desc()).limit(100)
-        
-        result = await session.execute(stmt)
-        existing_memories = result.scalars().all()
-        
-        existing = None
-        for em in existing_memories:
-            if em.simhash and hamming_distance(simhash, em.simhash) <= 3:
-                existing = em
-                break
-        
-        if existing:
-            # Boost salience on duplicate (same as Mac app's reinforceOnDuplicate)
-            DUPLICATE_BOOST = 0.15  # Same as Mac app
-            existing.salience = min(1.0, (existing.salience or 0.5) + DUPLICATE_BOOST)
-            existing.last_seen_at = datetime.utcnow()
-            existing.updated_at = datetime.utcnow()
-            await session.commit()
-            
-            saved_memories.append({
-                "id": str(existing.id),
-                "was_deduplicated": True
-            })
-            continue
-        
-        # Step 4: Classify sector
-        sector, additional_sectors, confidence = classify_sector(mem_content)
-        decay_lambda = get_sector_decay_lambda(sector)
-        
-        # Step 5: Calculate initial salience (same as Mac app: 0.4 + 0.1 per additional)
-        initial_salience = calculate_initial_salience(sector, additional_sectors)
-        
-        # Step 6: Generate embedding
-        embedding, dim = await embedding_service.embed(mem_content)
-        
-        # Step 7: Create memory
-        memory_id = str(uuid.uuid4())
-        # Get tags from mem_data if it's a dict, otherwise empty list
-        tags = mem_data.get("tags", []) if isinstance(mem_data, dict) else []
-        memory = Memory(
-            id=memory_id,
-            content=mem_content,
-            simhash=simhash,
-            sector=sector,
-            salience=initial_salience,
-            decay_lambda=decay_lambda,
-            segment=0,  # TODO: Implement segment rotation
-            tags=tags,
-            extra_metadata=request.metadata or {},
-            source_app=request.source_app,
-            user_id=request.user_id,
-            owner_id=owner_id,  # UniMemory user who owns this memory
-            embedding=embedding,
-            embedding_model=settings.EMBEDDING_MODEL,
-            is_active=True,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
-            last_seen_at=datetime.utcnow()
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Items cannot be empty")
+    if len(request.items) > settings.MEMORY_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.MEMORY_BATCH_MAX_ITEMS} items per batch"
         )
-        
-        session.add(memory)
-        await session.flush()  # Get memory ID
-        
-        # Step 8: Create waypoint link (find most similar existing memory)
-        await create_waypoint_for_memory(
-            session=session,
-            new_memory_id=memory_id,
-            new_embedding=embedding,
-            user_id=request.user_id
-        )
-        
-        saved_memories.append({
-            "id": memory_id,
-            "was_deduplicated": False
-        })
     
-    # Commit all changes
-    await session.commit()
-    
-    # Log processing
-    log = ProcessingLog(
-        id=str(uuid.uuid4()),
-        raw_content_hash=compute_simhash(content),
-        processed_at=datetime.utcnow(),
-        was_worth_remembering=True,
-        reason=worthiness.get("reason"),
-        extracted_count=len(saved_memories)
+    results = await ingest_batch(
+        session=session,
+        owner_id=owner_id,
+        items=[item.model_dump() for item in request.items]
     )
-    session.add(log)
-    await session.commit()
     
-    return {
-        "was_worth_remembering": True,
-        "reason": worthiness.get("reason"),
-        "extracted_count": len(saved_memories),
-        "memories": saved_memories
-    }
+    return {"results": results}
 
 
 @router.get("/memories", response_model=MemoryListResponse)
@@ -25,25 +25,85 @@ class Settings(BaseSettings):
     # OpenAI
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_MODEL: str = "gpt-4o-mini"
+    EXTRACTION_MODE: str = "two_call"  # "combined" = worthiness + extraction in one LLM call
+    PREFILTER_MODE: str = "off"  # Local pre-filter for greetings/noise: "off", "shadow" or "enforce"
+    LLM_MAX_CONCURRENT: int = 8  # In-flight chat completions per worker
+    LLM_MAX_QUEUE: int = 64  # Waiters per priority before requests are shed with 503
+    ADMISSION_RETRY_AFTER_SECONDS: float = 2.0  # Retry-After sent when shedding load
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = 30.0  # Deadline per chat completion attempt
+    EMBEDDING_ATTEMPT_TIMEOUT_SECONDS: float = 10.0  # Deadline per embedding attempt
+    PROVIDER_MAX_ATTEMPTS: int = 3  # Attempts per provider call (timeouts, connection errors, 5xx)
+    PROVIDER_BACKOFF_BASE_SECONDS: float = 0.25  # Jittered exponential backoff between attempts
+    PROVIDER_BACKOFF_MAX_SECONDS: float = 4.0
+    PROVIDER_HEDGING: bool = False  # Send a second request when an attempt outlives the recent p95
+    PROVIDER_HEDGE_MIN_SAMPLES: int = 20  # Latency samples needed before hedging starts
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open the circuit
+    CIRCUIT_RESET_SECONDS: float = 30.0  # How long an open circuit fails fast
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     EMBEDDING_DIM: int = 1536
+    EMBEDDING_BACKEND: str = "openai"  # openai | hashing (local CPU, no network)
+    EMBEDDING_STORAGE: str = "vector"  # vector (float32) | halfvec (float16, half the bytes); see scripts/embedding_storage.py
+    EMBEDDING_TIMEOUT_SECONDS: float = 10.0  # Total per-request timeout for embedding calls
+    EMBEDDING_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    EMBEDDING_MAX_CONNECTIONS: int = 50  # Pooled HTTP connections to the embedding provider
+    EMBEDDING_KEEPALIVE_CONNECTIONS: int = 20
+    EMBEDDING_KEEPALIVE_SECONDS: float = 30.0
+    EMBEDDING_BATCH_MAX_SIZE: int = 64  # Texts per coalesced provider request
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0  # How long the first queued text waits for company
+    EMBEDDING_MAX_CONCURRENT: int = 32  # Callers embedding cache misses at once (batched together)
+    EMBEDDING_MAX_QUEUE: int = 256  # Waiters per priority; search is served before ingestion
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # In-process tier size bound
+    EMBEDDING_CACHE_TTL_SECONDS: int = 24 * 60 * 60  # In-process tier entry lifetime
+    EMBEDDING_CACHE_PERSIST: bool = True  # Also read/write the embedding_cache table
+    EMBEDDING_CACHE_PERSIST_TTL_SECONDS: int = 30 * 24 * 60 * 60  # embedding_cache rows unused this long expire (0 keeps them)
+    EMBEDDING_CACHE_PRUNE_INTERVAL_SECONDS: int = 60 * 60  # How often each worker deletes expired embedding_cache rows
     
     # Auth
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
     FIREBASE_SERVICE_ACCOUNT_PATH: Optional[str] = None  # Path to Firebase service account JSON file
+    API_KEY_LEGACY_LOOKUP: bool = True  # bcrypt-scan keys created before key_digest existed; turn off once all are backfilled
+    API_KEY_CACHE_TTL_SECONDS: int = 300  # How long a verified key/user pair is trusted without a DB lookup
+    API_KEY_NEGATIVE_CACHE_SECONDS: int = 30  # How long an unknown key is rejected without a DB lookup (0 disables)
+    API_KEY_CACHE_MAX_ENTRIES: int = 10000
+    API_KEY_USAGE_FLUSH_SECONDS: float = 10.0  # How often aggregated usage counters are written
+    AUTH_POOL_WORKERS: int = 4  # Threads for bcrypt and Firebase token verification
+    FIREBASE_TOKEN_CACHE_MAX_ENTRIES: int = 10000  # Decoded ID tokens are cached until their exp claim
+    USER_CACHE_TTL_SECONDS: int = 60  # Dashboard users resolved by firebase_uid without a DB lookup
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_LAST_LOGIN_UPDATE_SECONDS: int = 300  # Minimum interval between last_login_at writes
     
     # Memory processing
     MIN_SALIENCE: float = 0.1
     DECAY_LAMBDA: float = 0.05
     SEGMENT_SIZE: int = 1000
     SUMMARY_MAX_LENGTH: int = 500
+    INGEST_WORKERS: int = 4  # Background workers processing async /memories/add jobs
+    INGEST_POLL_SECONDS: float = 2.0  # Idle workers re-check the job table this often
+    INGEST_JOB_LEASE_SECONDS: int = 300  # Running jobs not renewed for this long are reclaimed (crashed worker)
+    INGEST_JOB_MAX_ATTEMPTS: int = 3
+    INGEST_MEMO_TTL_SECONDS: int = 86400  # Re-sent identical input reuses its earlier outcome (0 = off)
+    MEMORY_BATCH_MAX_ITEMS: int = 500  # Max contents per /memories/batch request
+    MEMORY_BATCH_LLM_CHUNK: int = 20  # Inputs per worthiness/extraction LLM call in batch mode
+    SEMANTIC_DEDUP: bool = False  # Also merge memories whose embeddings are near-identical (ANN probe)
+    SEMANTIC_DEDUP_THRESHOLD: float = 0.92  # Cosine similarity at which two memories count as the same
     
     # Search
     DEFAULT_SEARCH_LIMIT: int = 10
     MIN_SIMILARITY_THRESHOLD: float = 0.2
+    EMBEDDING_PREFIX_DIM: int = 256  # Truncated prefix stored for the first search pass
+    TWO_STAGE_SEARCH: bool = False  # Prefix ANN pass + full-dimension rerank (backfill prefixes first)
+    TWO_STAGE_CANDIDATES: int = 100  # First-pass candidate pool size
+    BINARY_PREFILTER: str = "off"  # off | sql (Hamming <~> in Postgres) | numpy (in-process popcount)
+    BINARY_PREFILTER_CANDIDATES: int = 200  # Candidates kept by the binary pass for exact rerank
     WAYPOINT_EXPANSION_MAX: int = 20
+    IVFFLAT_PROBES: int = 10  # Lists scanned per owner/user-scoped ANN query (pgvector default is 1)
+    IVFFLAT_ITERATIVE_SCAN: str = "off"  # off | relaxed_order | strict_order (pgvector 0.8+): keep scanning until filters fill LIMIT
+    HNSW_EF_SEARCH: int = 40  # Minimum hnsw.ef_search per scoped ANN query; raised to the candidate pool size (pgvector caps it at 1000)
+    HNSW_ITERATIVE_SCAN: str = "off"  # off | relaxed_order | strict_order (pgvector 0.8+), as above for the hnsw indexes
+    WAYPOINT_TOP_K: int = 1  # Edges per new memory, best ANN matches above the waypoint similarity threshold
     
     # CORS
     CORS_ORIGINS: list = ["*"]  # Allow all in dev, restrict in prod
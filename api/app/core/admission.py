@@ -0,0 +1,134 @@
+"""
+Admission control for LLM and embedding provider calls
+"""
+from typing import Any, Dict, Optional
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+
+from app.config import settings
+
+
+# Waiters are served in this order when a slot frees up
+PRIORITIES = ("search", "ingest")
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing when a pool's wait queue is full (or the provider rate-limits)"""
+
+    def __init__(self, pool: str, retry_after: float, status_code: int = 503):
+        super().__init__(f"{pool} capacity exhausted, retry after {retry_after:.0f}s")
+        self.pool = pool
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class AdmissionPool:
+    """
+    Concurrency limit with bounded, prioritized wait queues
+
+    At most max_concurrent callers hold a slot. Others wait in a queue per
+    priority (search ahead of ingest); a caller arriving at a full queue is
+    rejected with Overloaded immediately instead of piling up latency.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, retry_after: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters: Dict[str, deque] = {priority: deque() for priority in PRIORITIES}
+        self.admitted = {priority: 0 for priority in PRIORITIES}
+        self.rejected = {priority: 0 for priority in PRIORITIES}
+        self.max_waiting = 0
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "ingest"):
+        """Hold one slot for the duration of the block"""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: str):
+        waiters = self._waiters[priority]
+        if self.active < self.max_concurrent and not self.waiting:
+            self.active += 1
+            self.admitted[priority] += 1
+            return
+
+        if len(waiters) >= self.max_queue:
+            self.rejected[priority] += 1
+            raise Overloaded(self.name, self.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # The slot was handed over as we were cancelled
+            else:
+                try:
+                    waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+        self.admitted[priority] += 1
+
+    def _release(self):
+        # Hand the slot straight to the highest-priority waiter
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self.active -= 1
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": {priority: len(waiters) for priority, waiters in self._waiters.items()},
+            "max_waiting": self.max_waiting,
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+        }
+
+
+def provider_retry_after(error: Exception, default: float) -> float:
+    """Retry-After from a provider error response, if it sent one"""
+    response = getattr(error, "response", None)
+    value: Optional[str] = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+# Chat completions (worthiness, extraction)
+llm_pool = AdmissionPool(
+    "llm",
+    max_concurrent=settings.LLM_MAX_CONCURRENT,
+    max_queue=settings.LLM_MAX_QUEUE,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS
+)
+
+# Embedding requests that miss the cache
+embedding_pool = AdmissionPool(
+    "embeddings",
+    max_concurrent=settings.EMBEDDING_MAX_CONCURRENT,
+    max_queue=settings.EMBEDDING_MAX_QUEUE,
+    retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS
+)
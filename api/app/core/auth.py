@@ -4,9 +4,13 @@ Authentication utilities for Firebase and API key validation
 from fastapi import Depends, HTTPException, Header, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
+import hashlib
+import time
 import firebase_admin
 from firebase_admin import credentials, auth as firebase_auth
 import json
@@ -14,9 +18,66 @@ import os
 
 from app.db.database import get_db
 from app.db.models import User, APIKey
-from app.core.security import verify_api_key
+from app.core.security import verify_api_key, digest_api_key, LEGACY_KEY_PREFIX
+from app.core.cache import TTLCache
+from app.core.usage import usage_recorder
+from app.core.offload import auth_pool
 from app.config import settings
 
+# Verified API keys: digest -> (User, APIKey), session-free copies (see _detached_copy),
+# or INVALID_API_KEY for a digest that matched no key
+api_key_cache = TTLCache(
+    max_entries=settings.API_KEY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.API_KEY_CACHE_TTL_SECONDS
+)
+INVALID_API_KEY = object()
+
+
+# Decoded Firebase ID tokens: sha256(token) -> claims, kept until the token's exp
+firebase_token_cache = TTLCache(
+    max_entries=settings.FIREBASE_TOKEN_CACHE_MAX_ENTRIES,
+    ttl_seconds=0
+)
+
+# Dashboard users: firebase_uid -> User, session-free copy (see _detached_copy)
+user_cache = TTLCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS
+)
+
+
+def _detached_copy(instance):
+    """
+    Copy of a loaded row (column attributes only) that belongs to no session
+    
+    Cached entries must not be the request's own instances: a rollback on
+    that session would expire them and later cache hits would fail to load.
+    """
+    mapper = inspect(instance).mapper
+    copy = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(copy, attr.key, getattr(instance, attr.key))
+    make_transient_to_detached(copy)
+    return copy
+
+
+async def _attach(session: AsyncSession, cached):
+    """Per-request instance of a cached row, without a DB round trip"""
+    return await session.merge(cached, load=False)
+
+
+def invalidate_api_key(key_digest: Optional[str]):
+    """Forget a cached API key (call when it is revoked)"""
+    if key_digest:
+        api_key_cache.invalidate(key_digest)
+
+
+def invalidate_user_api_keys(user_id: str):
+    """Forget all cached API keys of a user (call when the user is deactivated)"""
+    api_key_cache.invalidate_where(
+        lambda entry: entry is not INVALID_API_KEY and entry[0].id == user_id
+    )
+
 # Firebase initialization (lazy)
 _firebase_app = None
 
@@ -58,9 +119,17 @@ async def verify_firebase_token(token: str) -> dict:
     
     Returns dict with: uid, email, name, picture, etc.
     """
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    cached = firebase_token_cache.get(token_hash)
+    if cached is not None:
+        return cached
+    
     try:
         get_firebase_app()
-        decoded = firebase_auth.verify_id_token(token)
+        # Signature checks (and occasional cert fetches) block; keep them off the loop
+        decoded = await auth_pool.run(firebase_auth.verify_id_token, token)
+        # A verified token stays valid until it expires
+        firebase_token_cache.set(token_hash, decoded, ttl=decoded.get("exp", 0) - time.time())
         return decoded
     except firebase_auth.InvalidIdTokenError:
         raise HTTPException(
@@ -79,6 +148,16 @@ async def verify_firebase_token(token: str) -> dict:
         )
 
 
+def _last_login_is_stale(user: User, now: datetime) -> bool:
+    """Whether last_login_at is older than USER_LAST_LOGIN_UPDATE_SECONDS"""
+    last_login = user.last_login_at
+    if last_login is None:
+        return True
+    if last_login.tzinfo is not None:
+        last_login = last_login.astimezone(timezone.utc).replace(tzinfo=None)
+    return (now - last_login).total_seconds() >= settings.USER_LAST_LOGIN_UPDATE_SECONDS
+
+
 async def get_or_create_user(
     firebase_data: dict,
     session: AsyncSession
@@ -89,21 +168,44 @@ async def get_or_create_user(
     firebase_uid = firebase_data.get("uid")
     
     # Try to find existing user
-    stmt = select(User).where(User.firebase_uid == firebase_uid)
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
+    cached = user_cache.get(firebase_uid)
+    from_cache = cached is not None
+    if from_cache:
+        user = await _attach(session, cached)
+    else:
+        stmt = select(User).where(User.firebase_uid == firebase_uid)
+        result = await session.execute(stmt)
+        user = result.scalar_one_or_none()
     
     if user:
-        # Update last login
-        user.last_login_at = datetime.utcnow()
-        # Update profile if changed
+        # Only write when the profile changed or last login is stale
+        changes = {}
         if firebase_data.get("email") and user.email != firebase_data.get("email"):
-            user.email = firebase_data.get("email")
+            changes["email"] = firebase_data.get("email")
         if firebase_data.get("name") and user.display_name != firebase_data.get("name"):
-            user.display_name = firebase_data.get("name")
+            changes["display_name"] = firebase_data.get("name")
         if firebase_data.get("picture") and user.avatar_url != firebase_data.get("picture"):
-            user.avatar_url = firebase_data.get("picture")
-        await session.commit()
+            changes["avatar_url"] = firebase_data.get("picture")
+        
+        now = datetime.utcnow()
+        if _last_login_is_stale(user, now):
+            changes["last_login_at"] = now
+        
+        if changes:
+            await session.execute(update(User).where(User.id == user.id).values(**changes))
+            await session.commit()
+            # Mirror the write without marking the instances dirty
+            for key, value in changes.items():
+                set_committed_value(user, key, value)
+                if from_cache:
+                    set_committed_value(cached, key, value)
+            # API-key requests re-read a changed profile
+            if changes.keys() - {"last_login_at"}:
+                invalidate_user_api_keys(user.id)
+        
+        # Re-cache only after a DB read so the TTL bounds staleness
+        if not from_cache:
+            user_cache.set(firebase_uid, _detached_copy(user))
         return user
     
     # Create new user
@@ -118,6 +220,7 @@ async def get_or_create_user(
     await session.commit()
     await session.refresh(user)
     
+    user_cache.set(firebase_uid, _detached_copy(user))
     return user
 
 
@@ -142,6 +245,8 @@ async def get_current_user(
     user = await get_or_create_user(firebase_data, session)
     
     if not user.is_active:
+        user_cache.invalidate(user.firebase_uid)
+        invalidate_user_api_keys(user.id)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is deactivated"
@@ -150,6 +255,63 @@ async def get_current_user(
     return user
 
 
+async def _match_legacy_api_key(
+    x_api_key: str,
+    digest: str,
+    session: AsyncSession
+) -> Optional[tuple[APIKey, User]]:
+    """
+    Find a key created before key_digest existed by bcrypt-scanning them.
+    
+    Only keys without a digest are scanned, and a match gets its digest
+    stored, so each legacy key pays this cost once and the scan shrinks to
+    nothing as keys are used. Disable with API_KEY_LEGACY_LOOKUP once done.
+    """
+    if not x_api_key.startswith(LEGACY_KEY_PREFIX):
+        return None
+    
+    stmt = select(APIKey, User).join(User, User.id == APIKey.user_id).where(
+        APIKey.key_digest.is_(None),
+        APIKey.is_active == True
+    )
+    result = await session.execute(stmt)
+    candidates = result.all()
+    if not candidates:
+        return None
+    
+    def find_match() -> Optional[int]:
+        for i, (key, _) in enumerate(candidates):
+            if verify_api_key(x_api_key, key.key_hash):
+                return i
+        return None
+    
+    index = await auth_pool.run(find_match)
+    if index is None:
+        return None
+    
+    key, user = candidates[index]
+    key.key_digest = digest  # Committed by validate_api_key
+    return key, user
+
+
+def _check_api_key_usable(api_key: APIKey, user: User):
+    """Reject expired keys and keys of deactivated users, dropping them from the caches"""
+    if api_key.expires_at and api_key.expires_at < datetime.utcnow():
+        invalidate_api_key(api_key.key_digest)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="API key expired"
+        )
+    
+    if not user.is_active:
+        user_cache.invalidate(user.firebase_uid)
+        invalidate_user_api_keys(user.id)
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User not found or inactive"
+        )
+
+
 async def validate_api_key(
     x_api_key: Optional[str] = Header(None, alias="X-API-Key"),
     session: AsyncSession = Depends(get_db)
@@ -167,47 +329,48 @@ async def validate_api_key(
             detail="X-API-Key header required"
         )
     
-    # Get all active API keys and check against provided key
-    # Note: We iterate because bcrypt hashes can't be looked up directly
-    stmt = select(APIKey).where(APIKey.is_active == True)
-    result = await session.execute(stmt)
-    api_keys = result.scalars().all()
-    
-    matched_key = None
-    for key in api_keys:
-        if verify_api_key(x_api_key, key.key_hash):
-            matched_key = key
-            break
+    digest = digest_api_key(x_api_key)
     
-    if not matched_key:
+    cached = api_key_cache.get(digest)
+    if cached is INVALID_API_KEY:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key"
         )
+    if cached is not None:
+        cached_user, cached_key = cached
+        _check_api_key_usable(cached_key, cached_user)
+        usage_recorder.record(cached_key.id)
+        return await _attach(session, cached_user), await _attach(session, cached_key)
+    
+    # Resolve the key and its owner in one indexed lookup on the digest
+    stmt = select(APIKey, User).join(User, User.id == APIKey.user_id).where(
+        APIKey.key_digest == digest,
+        APIKey.is_active == True
+    )
+    result = await session.execute(stmt)
+    row = result.first()
     
-    # Check expiration
-    if matched_key.expires_at and matched_key.expires_at < datetime.utcnow():
+    if row is None and settings.API_KEY_LEGACY_LOOKUP:
+        row = await _match_legacy_api_key(x_api_key, digest, session)
+    
+    if row is None:
+        # Repeated bad keys (typos, retry loops, guessing) skip the lookup
+        api_key_cache.set(digest, INVALID_API_KEY, ttl=settings.API_KEY_NEGATIVE_CACHE_SECONDS)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="API key expired"
+            detail="Invalid API key"
         )
     
-    # Update usage tracking
-    matched_key.last_used_at = datetime.utcnow()
-    matched_key.usage_count = (matched_key.usage_count or 0) + 1
+    matched_key, user = row
+    _check_api_key_usable(matched_key, user)
     
-    # Get user
-    stmt = select(User).where(User.id == matched_key.user_id)
-    result = await session.execute(stmt)
-    user = result.scalar_one_or_none()
-    
-    if not user or not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="User not found or inactive"
-        )
+    # Persist a backfilled legacy digest; usage is written behind
+    if session.dirty:
+        await session.commit()
+    usage_recorder.record(matched_key.id)
     
-    await session.commit()
+    api_key_cache.set(digest, (_detached_copy(user), _detached_copy(matched_key)))
     
     return user, matched_key
 
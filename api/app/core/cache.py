@@ -0,0 +1,103 @@
+"""
+Bounded in-process TTL/LRU cache
+"""
+from typing import Any, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+import time
+
+
+class TTLCache:
+    """
+    LRU cache with per-entry expiry and hit/miss/eviction counters
+
+    Optionally bounded by total size as well, with sizeof giving the size
+    of each value in bytes. Not thread-safe; meant to be used from the
+    event loop only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof or (lambda value: 0)
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return cached value or None if missing/expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store value, evicting least recently used entries when full"""
+        ttl = self.ttl_seconds if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self.bytes += self._sizeof(value)
+
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= self._sizeof(entry[1])
+
+    def invalidate(self, key: Hashable):
+        """Drop a single entry"""
+        self._remove(key)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop all entries whose value matches predicate"""
+        stale = [k for k, (_, v) in self._entries.items() if predicate(v)]
+        for key in stale:
+            self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        """Drop all entries"""
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,139 @@
+"""
+Embedding backends selected by EMBEDDING_BACKEND
+"""
+from typing import List, Optional
+import hashlib
+import re
+import httpx
+import numpy as np
+import openai
+from app.core.admission import Overloaded, provider_retry_after
+from app.core.resilience import embedding_resilience
+from app.config import settings
+
+
+class EmbeddingBackend:
+    """Interface for turning texts into vectors"""
+    
+    # Identifies the vector space; cached vectors and Memory.embedding_model use it
+    model_name: str = ""
+    # Vector dimension, or None until known
+    dim: Optional[int] = None
+    # Remote backends benefit from caching and request coalescing
+    remote: bool = False
+    
+    async def embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed texts, returning vectors in input order (None where a text has no features)"""
+        raise NotImplementedError
+    
+    async def close(self):
+        """Release connections or other resources"""
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """OpenAI embeddings API over a pooled async HTTP client"""
+    
+    remote = True
+    
+    def __init__(self):
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not set in config")
+        self.model_name = settings.EMBEDDING_MODEL
+        self.dim = settings.EMBEDDING_DIM
+        # Pooled keep-alive connections so concurrent requests overlap their round trips
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.EMBEDDING_TIMEOUT_SECONDS,
+                connect=settings.EMBEDDING_CONNECT_TIMEOUT_SECONDS
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.EMBEDDING_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.EMBEDDING_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.EMBEDDING_KEEPALIVE_SECONDS
+            )
+        )
+        self.client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            http_client=self.http_client,
+            max_retries=0  # Retries are handled by embedding_resilience
+        )
+    
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with a single provider request (retried/hedged as needed)"""
+        async def attempt():
+            try:
+                return await self.client.embeddings.create(
+                    model=self.model_name,
+                    input=texts
+                )
+            except openai.RateLimitError as e:
+                retry_after = provider_retry_after(e, settings.ADMISSION_RETRY_AFTER_SECONDS)
+                raise Overloaded("embeddings", retry_after, status_code=429)
+        
+        response = await embedding_resilience.call(attempt)
+        # The API may return items out of order; index restores input order
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
+    async def close(self):
+        await self.client.close()
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic local embedder using signed feature hashing
+    
+    Word unigrams, word bigrams and character trigrams are hashed into
+    EMBEDDING_DIM buckets with a sign bit and L2-normalized. No network or
+    model weights; captures lexical rather than semantic similarity, which
+    is enough for offline benchmarks and latency-critical tenants.
+    
+    Texts with no word characters (emoji, punctuation) have no features and
+    get no vector rather than a zero vector, whose cosine distance is NaN.
+    """
+    
+    TOKEN_PATTERN = re.compile(r"\w+")
+    
+    def __init__(self):
+        self.dim = settings.EMBEDDING_DIM
+        self.model_name = f"local-hashing-{self.dim}"
+    
+    def _features(self, text: str) -> List[str]:
+        words = self.TOKEN_PATTERN.findall(text.casefold())
+        features = [f"w:{w}" for w in words]
+        features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"^{word}$"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+    
+    def embed_one(self, text: str) -> Optional[List[float]]:
+        """Embed a single text, or None if it has no features"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vector[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        vector /= norm
+        return vector.tolist()
+    
+    async def embed_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return [self.embed_one(text) for text in texts]
+
+
+BACKENDS = {
+    "openai": OpenAIEmbeddingBackend,
+    "hashing": HashingEmbeddingBackend,
+}
+
+
+def create_backend(name: str) -> EmbeddingBackend:
+    """Instantiate the backend registered under name"""
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return backend_cls()
@@ -0,0 +1,88 @@
+"""
+Cross-request embedding micro-batcher
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce concurrent embedding requests into batched provider calls
+    
+    Texts queue up until max_batch texts are pending or max_wait_ms has
+    passed since the first one arrived, then go out in one request whose
+    results are fanned back to each awaiting caller.
+    """
+    
+    def __init__(
+        self,
+        embed_many: Callable[[List[str]], Awaitable[List[List[float]]]],
+        max_batch: int,
+        max_wait_ms: float
+    ):
+        self._embed_many = embed_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending: List[tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.texts = 0
+        self.largest_batch = 0
+    
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Queue texts for the next batch and wait for their embeddings"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self._pending.append((text, future))
+            futures.append(future)
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+        
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        
+        return list(await asyncio.gather(*futures))
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: List[tuple[str, asyncio.Future]]):
+        # Concurrent callers often send the same text (e.g. a popular query)
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.texts += len(unique_texts)
+        self.largest_batch = max(self.largest_batch, len(unique_texts))
+        
+        try:
+            embeddings = await self._embed_many(unique_texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        by_text = dict(zip(unique_texts, embeddings))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "texts": self.texts,
+            "largest_batch": self.largest_batch,
+            "avg_batch": self.texts / self.batches if self.batches else 0.0,
+        }
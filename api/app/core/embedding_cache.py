@@ -0,0 +1,187 @@
+"""
+Two-tier content-addressed embedding cache (in-process LRU + Postgres)
+"""
+from typing import Dict, List, Optional, Any
+from datetime import timedelta
+import hashlib
+import time
+import numpy as np
+from sqlalchemy import select, update, text, func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.cache import TTLCache
+from app.db.database import AsyncSessionLocal
+from app.db.models import EmbeddingCacheEntry
+from app.config import settings
+
+# A hit rewrites last_used_at only if it is older than this, so hot rows
+# are not updated on every lookup
+TOUCH_INTERVAL = timedelta(hours=1)
+# Rows deleted per pruning statement
+PRUNE_BATCH = 10_000
+
+PRUNE_SQL = text("""
+    DELETE FROM embedding_cache
+    WHERE ctid = ANY(ARRAY(
+        SELECT ctid FROM embedding_cache
+        WHERE last_used_at < now() - make_interval(secs => :ttl)
+        LIMIT :batch
+    ))
+""")
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different inputs share an entry"""
+    return " ".join(text.split())
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of normalized text"""
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def pack_vector(embedding: List[float]) -> bytes:
+    """Pack a vector as little-endian float32"""
+    return np.asarray(embedding, dtype="<f4").tobytes()
+
+
+def unpack_vector(data: bytes) -> List[float]:
+    """Inverse of pack_vector"""
+    return np.frombuffer(data, dtype="<f4").tolist()
+
+
+class EmbeddingCache:
+    """
+    Cache of embeddings keyed by (model, normalized text hash)
+    
+    The in-process tier holds packed float32 vectors bounded by total bytes.
+    The persistent tier survives restarts and is shared between workers;
+    rows not read for EMBEDDING_CACHE_PERSIST_TTL_SECONDS are treated as
+    misses and pruned. Failures in the persistent tier are logged and
+    treated as misses.
+    """
+    
+    def __init__(self):
+        self.memory = TTLCache(
+            max_entries=1_000_000,
+            ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+            sizeof=len
+        )
+        self.persist = settings.EMBEDDING_CACHE_PERSIST
+        self.persist_ttl = settings.EMBEDDING_CACHE_PERSIST_TTL_SECONDS
+        self._last_prune = time.monotonic()
+        self.db_pruned = 0
+        self.db_hits = 0
+        self.db_misses = 0
+        self.db_errors = 0
+    
+    async def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up texts, returning None for misses in both tiers"""
+        hashes = [text_hash(t) for t in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        
+        for i, h in enumerate(hashes):
+            packed = self.memory.get((model, h))
+            if packed is not None:
+                results[i] = unpack_vector(packed)
+            else:
+                missing.setdefault(h, []).append(i)
+        
+        if not missing or not self.persist:
+            return results
+        
+        try:
+            async with AsyncSessionLocal() as session:
+                conditions = [
+                    EmbeddingCacheEntry.model == model,
+                    EmbeddingCacheEntry.text_hash.in_(list(missing.keys()))
+                ]
+                if self.persist_ttl > 0:
+                    conditions.append(
+                        EmbeddingCacheEntry.last_used_at >= func.now() - timedelta(seconds=self.persist_ttl)
+                    )
+                stmt = select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.vector).where(*conditions)
+                rows = (await session.execute(stmt)).all()
+                if rows and self.persist_ttl > 0:
+                    await session.execute(
+                        update(EmbeddingCacheEntry).where(
+                            EmbeddingCacheEntry.model == model,
+                            EmbeddingCacheEntry.text_hash.in_([h for h, _ in rows]),
+                            EmbeddingCacheEntry.last_used_at < func.now() - TOUCH_INTERVAL
+                        ).values(last_used_at=func.now())
+                    )
+                    await session.commit()
+        except Exception as e:
+            self.db_errors += 1
+            print(f"[EmbeddingCache] Lookup failed: {e}")
+            return results
+        
+        for h, packed in rows:
+            packed = bytes(packed)
+            self.memory.set((model, h), packed)
+            vector = unpack_vector(packed)
+            for i in missing.pop(h):
+                results[i] = vector
+                self.db_hits += 1
+        
+        self.db_misses += sum(len(indexes) for indexes in missing.values())
+        return results
+    
+    async def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """Store freshly computed embeddings in both tiers"""
+        rows = {}
+        for content, embedding in zip(texts, embeddings):
+            h = text_hash(content)
+            packed = pack_vector(embedding)
+            self.memory.set((model, h), packed)
+            rows[h] = {"model": model, "text_hash": h, "dim": len(embedding), "vector": packed}
+        
+        if not rows or not self.persist:
+            return
+        
+        try:
+            async with AsyncSessionLocal() as session:
+                stmt = insert(EmbeddingCacheEntry).values(list(rows.values()))
+                # An expired row that was not pruned yet starts over
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["model", "text_hash"],
+                    set_={"last_used_at": func.now()}
+                )
+                await session.execute(stmt)
+                await session.commit()
+                await self._prune_expired(session)
+        except Exception as e:
+            self.db_errors += 1
+            print(f"[EmbeddingCache] Store failed: {e}")
+    
+    async def _prune_expired(self, session):
+        """Delete expired rows, at most every EMBEDDING_CACHE_PRUNE_INTERVAL_SECONDS"""
+        now = time.monotonic()
+        if self.persist_ttl <= 0 or now - self._last_prune < settings.EMBEDDING_CACHE_PRUNE_INTERVAL_SECONDS:
+            return
+        self._last_prune = now
+        
+        # Small batches keep each delete short; a backlog is cleared over several passes
+        result = await session.execute(PRUNE_SQL, {"ttl": float(self.persist_ttl), "batch": PRUNE_BATCH})
+        await session.commit()
+        self.db_pruned += result.rowcount
+        if result.rowcount:
+            print(f"[EmbeddingCache] Pruned {result.rowcount} expired rows")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        memory = self.memory.stats()
+        lookups = memory["hits"] + memory["misses"]
+        return {
+            "memory": memory,
+            "db_hits": self.db_hits,
+            "db_misses": self.db_misses,
+            "db_errors": self.db_errors,
+            "db_pruned": self.db_pruned,
+            "hit_rate": (memory["hits"] + self.db_hits) / lookups if lookups else 0.0,
+        }
+
+
+embedding_cache = EmbeddingCache()
@@ -1,64 +1,110 @@
 """
-Embedding generation using OpenAI
+Embedding generation (OpenAI or local backend)
 """
-from typing import List, Optional
-import openai
+from typing import Any, Dict, List, Optional
+from app.core.embedding_backends import create_backend
+from app.core.embedding_cache import embedding_cache
+from app.core.embedding_batcher import EmbeddingBatcher
+from app.core.admission import embedding_pool, Overloaded
 from app.config import settings
 
 
 class EmbeddingService:
-    """Generate embeddings for text using OpenAI"""
+    """Generate embeddings for text using the configured backend"""
     
     def __init__(self):
-        if not settings.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not set in config")
-        openai.api_key = settings.OPENAI_API_KEY
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.backend = create_backend(settings.EMBEDDING_BACKEND)
+        # Concurrent embed() calls share provider requests
+        self.batcher = EmbeddingBatcher(
+            self.backend.embed_many,
+            max_batch=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+        )
     
-    async def embed(self, text: str) -> tuple[List[float], int]:
+    @property
+    def model_name(self) -> str:
+        """Name of the vector space embeddings are produced in"""
+        return self.backend.model_name
+    
+    @property
+    def dim(self) -> Optional[int]:
+        """Embedding dimension reported by the backend"""
+        return self.backend.dim
+    
+    async def embed(self, text: str, priority: str = "ingest") -> tuple[Optional[List[float]], int]:
         """
         Generate embedding for text
         
+        priority="search" puts the call ahead of ingestion when the provider
+        pool is saturated.
+        
         Returns:
-            (embedding_vector, dimension)
+            (embedding_vector, dimension), or (None, 0) if the backend
+            produced no vector for the text
         """
         try:
-            response = self.client.embeddings.create(
-                model=settings.EMBEDDING_MODEL,
-                input=text
-            )
-            
-            embedding = response.data[0].embedding
-            dim = len(embedding)
-            
-            return embedding, dim
+            embedding = (await self._embed_cached([text], priority))[0]
+            return embedding, len(embedding or [])
             
+        except Overloaded:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate embedding: {e}")
     
-    async def embed_batch(self, texts: List[str]) -> List[tuple[List[float], int]]:
+    async def embed_batch(self, texts: List[str], priority: str = "ingest") -> List[tuple[Optional[List[float]], int]]:
         """
         Generate embeddings for multiple texts in batch
         
         Returns:
-            List of (embedding_vector, dimension) tuples
+            List of (embedding_vector, dimension) tuples, (None, 0) where
+            the backend produced no vector
         """
         try:
-            response = self.client.embeddings.create(
-                model=settings.EMBEDDING_MODEL,
-                input=texts
-            )
-            
-            results = []
-            for item in response.data:
-                embedding = item.embedding
-                dim = len(embedding)
-                results.append((embedding, dim))
-            
-            return results
+            embeddings = await self._embed_cached(texts, priority)
+            return [(embedding, len(embedding or [])) for embedding in embeddings]
             
+        except Overloaded:
+            raise
         except Exception as e:
             raise Exception(f"Failed to generate batch embeddings: {e}")
+    
+    async def _embed_remote(self, texts: List[str], priority: str) -> List[List[float]]:
+        """Provider call through the batcher, admitted through the embedding pool"""
+        async with embedding_pool.slot(priority):
+            return await self.batcher.embed_many(texts)
+    
+    async def _embed_cached(self, texts: List[str], priority: str = "ingest") -> List[List[float]]:
+        """Serve texts from the embedding cache, calling the provider for misses only"""
+        if not texts:
+            return []
+        if not self.backend.remote:
+            # Local backends are cheaper than a cache lookup
+            return await self.backend.embed_many(texts)
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return await self._embed_remote(texts, priority)
+        
+        model = self.backend.model_name
+        results = await embedding_cache.get_many(model, texts)
+        
+        # Embed each distinct missing text once
+        missing: Dict[str, List[int]] = {}
+        for i, embedding in enumerate(results):
+            if embedding is None:
+                missing.setdefault(texts[i], []).append(i)
+        
+        if missing:
+            missing_texts = list(missing.keys())
+            embeddings = await self._embed_remote(missing_texts, priority)
+            for text, embedding in zip(missing_texts, embeddings):
+                for i in missing[text]:
+                    results[i] = embedding
+            await embedding_cache.put_many(model, missing_texts, embeddings)
+        
+        return results
+    
+    async def close(self):
+        """Close pooled provider connections"""
+        await self.backend.close()
 
 
 # Singleton instance
@@ -72,3 +118,18 @@ def get_embedding_service() -> EmbeddingService:
         _embedding_service = EmbeddingService()
     return _embedding_service
 
+
+def embedding_stats() -> Dict[str, Any]:
+    """Cache and batching counters for monitoring"""
+    stats = {"cache": embedding_cache.stats()}
+    if _embedding_service is not None:
+        stats["batcher"] = _embedding_service.batcher.stats()
+    return stats
+
+
+async def close_embedding_service():
+    """Close the singleton's connections (called on shutdown)"""
+    global _embedding_service
+    if _embedding_service is not None:
+        await _embedding_service.close()
+        _embedding_service = None
@@ -1,32 +1,18 @@
 """
 LLM-based memory extraction
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import openai
 import json
+import textwrap
+from app.core.prefilter import worthiness_prefilter
+from app.core.admission import llm_pool, Overloaded, provider_retry_after
+from app.core.resilience import llm_resilience
 from app.config import settings
 
 
-class MemoryExtractor:
-    """Extract structured memories from raw text using LLM"""
-    
-    def __init__(self):
-        if not settings.OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not set in config")
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-    
-    async def check_worthiness(self, text: str) -> Dict[str, Any]:
-        """
-        Check if text is worth remembering
-        
-        Returns:
-            {
-                "is_worth_remembering": bool,
-                "reason": str,
-                "suggested_types": List[str]
-            }
-        """
-        system_prompt = """You are a memory assistant. Decide if user input is worth remembering.
+# Shared prompt sections, so the single-purpose and combined prompts can't drift apart
+WORTHINESS_CRITERIA = """You are a memory assistant. Decide if user input is worth remembering.
 
 Worth remembering:
 - Personal facts (name, age, location, preferences)
@@ -42,29 +28,129 @@ NOT worth remembering:
 - Transient state ("I'm typing", "loading...")
 - Generic greetings
 - Commands without context
-- Random characters or gibberish
+- Random characters or gibberish"""
 
-Return JSON:
-{
-  "is_worth_remembering": true/false,
+WORTHINESS_FIELDS = """  "is_worth_remembering": true/false,
   "reason": "explanation",
-  "suggested_types": ["fact", "preference", "goal", ...]
+  "suggested_types": ["fact", "preference", "goal", ...]"""
+
+EXTRACTION_GUIDE = """For each meaningful fact, preference, goal, or insight, create a memory.
+
+Memory types:
+- fact: Personal facts ("User's name is John", "User lives in SF")
+- preference: Preferences ("User prefers dark mode", "User likes pizza")
+- goal: Goals ("User wants to learn Swift", "User plans to travel")
+- relationship: Relationships ("User works with Sarah", "User's manager is Mike")
+- event: Events ("Meeting tomorrow at 3pm", "Deadline is Friday")
+- skill: Skills ("User knows Python", "User is good at design")
+- project: Projects ("User is building Cortex app", "Working on X feature")
+- insight: General insights
+- belief: Beliefs or values
+- instruction: How user wants things done"""
+
+MEMORY_SCHEMA = """{
+  "content": "Extracted fact/insight",
+  "type": "fact",
+  "confidence": 0.9,
+  "tags": ["tag1", "tag2"],
+  "expires_at": null  // ISO date string or null
 }"""
+
+WORTHINESS_PROMPT = f"""{WORTHINESS_CRITERIA}
+
+Return JSON:
+{{
+{WORTHINESS_FIELDS}
+}}"""
+
+EXTRACTION_PROMPT = f"""You extract structured memories from user input.
+
+{EXTRACTION_GUIDE}
+
+Return JSON array:
+[
+{textwrap.indent(MEMORY_SCHEMA, "  ")}
+]"""
+
+COMBINED_PROMPT = f"""{WORTHINESS_CRITERIA}
+
+If it is worth remembering, also extract structured memories from it.
+
+{EXTRACTION_GUIDE}
+
+Return JSON:
+{{
+{WORTHINESS_FIELDS},
+  "memories": [
+{textwrap.indent(MEMORY_SCHEMA, "    ")}
+  ]  // empty when not worth remembering
+}}"""
+
+# Worthiness verdict and the extracted memories ([] when not worth remembering)
+Analysis = Tuple[Dict[str, Any], List[Dict[str, Any]]]
+
+BATCH_INSTRUCTIONS = """
+
+You will receive several inputs, each prefixed with its index like [0], [1], ...
+Judge each input independently and return JSON:
+{
+  "results": [
+    {"index": 0, ...result for input 0...},
+    ...
+  ]
+}
+with exactly one entry per input."""
+
+
+class MemoryExtractor:
+    """Extract structured memories from raw text using LLM"""
+    
+    def __init__(self):
+        if not settings.OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not set in config")
+        # Retries are handled by llm_resilience
+        self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+    
+    async def _chat(self, system_prompt: str, user_content: str) -> str:
+        """One JSON-mode chat completion, admitted through the LLM pool with retries"""
+        async def attempt():
+            try:
+                return await self.client.chat.completions.create(
+                    model=settings.OPENAI_MODEL,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content}
+                    ],
+                    temperature=0.3,
+                    response_format={"type": "json_object"}
+                )
+            except openai.RateLimitError as e:
+                retry_after = provider_retry_after(e, settings.ADMISSION_RETRY_AFTER_SECONDS)
+                raise Overloaded("llm", retry_after, status_code=429)
+        
+        async with llm_pool.slot():
+            response = await llm_resilience.call(attempt)
+        return response.choices[0].message.content
+    
+    async def check_worthiness(self, text: str) -> Dict[str, Any]:
+        """
+        Check if text is worth remembering
+        
+        Returns:
+            {
+                "is_worth_remembering": bool,
+                "reason": str,
+                "suggested_types": List[str]
+            }
+        """
+        system_prompt = WORTHINESS_PROMPT
         
         try:
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Input: {text}"}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(await self._chat(system_prompt, f"Input: {text}"))
             return result
             
+        except Overloaded:
+            raise
         except Exception as e:
             # Default to worth remembering if LLM fails
             return {
@@ -86,45 +172,10 @@ Return JSON:
                 "expires_at": Optional[str] (ISO format)
             }
         """
-        system_prompt = """You extract structured memories from user input.
-
-For each meaningful fact, preference, goal, or insight, create a memory.
-
-Memory types:
-- fact: Personal facts ("User's name is John", "User lives in SF")
-- preference: Preferences ("User prefers dark mode", "User likes pizza")
-- goal: Goals ("User wants to learn Swift", "User plans to travel")
-- relationship: Relationships ("User works with Sarah", "User's manager is Mike")
-- event: Events ("Meeting tomorrow at 3pm", "Deadline is Friday")
-- skill: Skills ("User knows Python", "User is good at design")
-- project: Projects ("User is building Cortex app", "Working on X feature")
-- insight: General insights
-- belief: Beliefs or values
-- instruction: How user wants things done
-
-Return JSON array:
-[
-  {
-    "content": "Extracted fact/insight",
-    "type": "fact",
-    "confidence": 0.9,
-    "tags": ["tag1", "tag2"],
-    "expires_at": null  // ISO date string or null
-  }
-]"""
+        system_prompt = EXTRACTION_PROMPT
         
         try:
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Extract memories from: {text}"}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
-            
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(await self._chat(system_prompt, f"Extract memories from: {text}"))
             
             # Handle both {"memories": [...]} and [...] formats
             if "memories" in result:
@@ -145,9 +196,193 @@ Return JSON array:
             
             return memories
             
+        except Overloaded:
+            raise
         except Exception as e:
             print(f"[Extractor] Failed to extract memories: {e}")
             return []
+    
+    async def _complete_batch(self, system_prompt: str, texts: List[str]) -> Dict[int, Dict[str, Any]]:
+        raw = await self._chat(system_prompt + BATCH_INSTRUCTIONS, _number_inputs(texts))
+        return _results_by_index(raw, len(texts))
+    
+    async def check_worthiness_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        check_worthiness for many inputs, MEMORY_BATCH_LLM_CHUNK inputs per LLM call
+        
+        Inputs the model skipped or garbled are retried one at a time.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        chunk_size = settings.MEMORY_BATCH_LLM_CHUNK
+        
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            try:
+                by_index = await self._complete_batch(WORTHINESS_PROMPT, chunk)
+            except Overloaded:
+                raise
+            except Exception as e:
+                print(f"[Extractor] Batched worthiness check failed: {e}")
+                by_index = {}
+            
+            for i, entry in by_index.items():
+                if isinstance(entry.get("is_worth_remembering"), bool):
+                    results[start + i] = entry
+        
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                results[i] = await self.check_worthiness(text)
+        
+        return results
+    
+    async def extract_memories_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        extract_memories for many inputs, MEMORY_BATCH_LLM_CHUNK inputs per LLM call
+        
+        Inputs the model skipped or garbled are retried one at a time.
+        """
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(texts)
+        chunk_size = settings.MEMORY_BATCH_LLM_CHUNK
+        prompt = EXTRACTION_PROMPT + """
+
+For batched input, put each input's array under "memories":
+{"index": 0, "memories": [...]}"""
+        
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            try:
+                by_index = await self._complete_batch(prompt, chunk)
+            except Overloaded:
+                raise
+            except Exception as e:
+                print(f"[Extractor] Batched extraction failed: {e}")
+                by_index = {}
+            
+            for i, entry in by_index.items():
+                if isinstance(entry.get("memories"), list):
+                    results[start + i] = entry["memories"]
+        
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                results[i] = await self.extract_memories(text)
+        
+        return results
+    
+    async def analyze(self, text: str) -> Analysis:
+        """
+        Worthiness check plus extraction
+        
+        Input the local pre-filter rejects skips the LLM (PREFILTER_MODE=enforce).
+        """
+        verdict = worthiness_prefilter.check(text)
+        if verdict is not None:
+            return verdict, []
+        
+        analysis = await self._analyze_llm(text)
+        worthiness_prefilter.record_shadow(text, analysis[0])
+        return analysis
+    
+    async def analyze_batch(self, texts: List[str]) -> List[Analysis]:
+        """analyze for many inputs, sending only what the pre-filter passes to the LLM"""
+        results: List[Optional[Analysis]] = [None] * len(texts)
+        to_llm = []
+        for i, text in enumerate(texts):
+            verdict = worthiness_prefilter.check(text)
+            if verdict is None:
+                to_llm.append(i)
+            else:
+                results[i] = (verdict, [])
+        
+        analyses = await self._analyze_llm_batch([texts[i] for i in to_llm]) if to_llm else []
+        for i, analysis in zip(to_llm, analyses):
+            worthiness_prefilter.record_shadow(texts[i], analysis[0])
+            results[i] = analysis
+        
+        return results
+    
+    async def _analyze_llm(self, text: str) -> Analysis:
+        """
+        With EXTRACTION_MODE=combined both come from one LLM call; otherwise,
+        or if the combined response is unusable, check_worthiness and
+        extract_memories are called in turn.
+        """
+        if settings.EXTRACTION_MODE == "combined":
+            try:
+                analysis = _split_combined(json.loads(await self._chat(COMBINED_PROMPT, f"Input: {text}")))
+                if analysis is not None:
+                    return analysis
+                print("[Extractor] Combined response malformed, falling back to two calls")
+            except Overloaded:
+                raise
+            except Exception as e:
+                print(f"[Extractor] Combined analysis failed, falling back to two calls: {e}")
+        
+        worthiness = await self.check_worthiness(text)
+        if not worthiness.get("is_worth_remembering", False):
+            return worthiness, []
+        return worthiness, await self.extract_memories(text)
+    
+    async def _analyze_llm_batch(self, texts: List[str]) -> List[Analysis]:
+        """
+        _analyze_llm for many inputs, using the batched LLM calls
+        
+        In combined mode each chunk needs one call; inputs the model skipped
+        or garbled go through the two-call batch path.
+        """
+        results: List[Optional[Analysis]] = [None] * len(texts)
+        
+        if settings.EXTRACTION_MODE == "combined":
+            chunk_size = settings.MEMORY_BATCH_LLM_CHUNK
+            for start in range(0, len(texts), chunk_size):
+                chunk = texts[start:start + chunk_size]
+                try:
+                    by_index = await self._complete_batch(COMBINED_PROMPT, chunk)
+                except Overloaded:
+                    raise
+                except Exception as e:
+                    print(f"[Extractor] Batched combined analysis failed: {e}")
+                    by_index = {}
+                
+                for i, entry in by_index.items():
+                    results[start + i] = _split_combined(entry)
+        
+        remaining = [i for i, analysis in enumerate(results) if analysis is None]
+        if remaining:
+            checks = await self.check_worthiness_batch([texts[i] for i in remaining])
+            worth = [i for i, check in zip(remaining, checks) if check.get("is_worth_remembering", False)]
+            extracted = dict(zip(worth, await self.extract_memories_batch([texts[i] for i in worth])))
+            for i, check in zip(remaining, checks):
+                results[i] = (check, extracted.get(i, []))
+        
+        return results
+
+
+def _split_combined(result: Any) -> Optional[Analysis]:
+    """Validate a combined-mode response; None if it is unusable"""
+    if not isinstance(result, dict) or not isinstance(result.get("is_worth_remembering"), bool):
+        return None
+    memories = result.pop("memories", [])
+    if not isinstance(memories, list):
+        return None
+    result.pop("index", None)
+    if not result["is_worth_remembering"]:
+        memories = []
+    return result, memories
+
+
+def _number_inputs(texts: List[str]) -> str:
+    return "\n\n".join(f"[{i}] {t}" for i, t in enumerate(texts))
+
+
+def _results_by_index(raw: str, count: int) -> Dict[int, Dict[str, Any]]:
+    """Parse a batched {"results": [...]} response, keeping well-formed entries only"""
+    result = json.loads(raw)
+    entries = result.get("results", []) if isinstance(result, dict) else result
+    by_index = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if isinstance(entry, dict) and isinstance(entry.get("index"), int) and 0 <= entry["index"] < count:
+            by_index[entry["index"]] = entry
+    return by_index
 
 
 # Singleton instance
@@ -161,3 +396,11 @@ def get_extractor() -> MemoryExtractor:
         _extractor = MemoryExtractor()
     return _extractor
 
+
+async def close_extractor():
+    """Close the singleton's HTTP client (called on shutdown)"""
+    global _extractor
+    if _extractor is not None:
+        await _extractor.client.close()
+        _extractor = None
+
@@ -0,0 +1,761 @@
+"""
+Memory ingestion pipeline (worthiness check, extraction, dedup, storage)
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from collections import defaultdict
+import asyncio
+from datetime import datetime, timedelta
+import hashlib
+import json
+import uuid
+import numpy as np
+from sqlalchemy import select, func, cast, literal, literal_column, or_, union_all, text, BigInteger
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Memory, ProcessingLog
+from app.core.extractor import get_extractor
+from app.core.embeddings import get_embedding_service
+from app.core.simhash import (
+    compute_simhashes, simhash_to_hex, hamming_distance,
+    simhash_distance_sql, simhash_bands, simhash_band_sql, SIMHASH_BANDS
+)
+from app.core.sector import classify_sector, get_sector_decay_lambda, calculate_initial_salience
+from app.core.waypoints import create_waypoints_for_memories
+from app.core.vectors import truncate_normalize, binary_code, tune_scoped_ann
+from app.config import settings
+
+
+# Called with a stage name and counters as the pipeline advances
+ProgressCallback = Callable[..., Awaitable[None]]
+
+
+# Same as Mac app's reinforceOnDuplicate
+DUPLICATE_BOOST = 0.15
+# Max SimHash distance for two memories to count as duplicates
+DUPLICATE_MAX_DISTANCE = 3
+# Memories without an integer SimHash (not yet backfilled) compared against, by salience
+DUPLICATE_CANDIDATES = 100
+
+# Boosts every stored duplicate of a batch in one statement; hits is how many
+# candidates matched the memory, tags those of reworded (semantic) duplicates.
+# Callers pass ids sorted so concurrent batches lock rows in the same order
+REINFORCE_SQL = text("""
+    UPDATE memories AS m
+    SET salience = LEAST(1.0, COALESCE(m.salience, 0.5) + :boost * u.hits),
+        last_seen_at = now(),
+        updated_at = now(),
+        tags = COALESCE(m.tags, '[]'::jsonb) || COALESCE((
+            SELECT jsonb_agg(t) FROM jsonb_array_elements(u.tags::jsonb) AS t
+            WHERE NOT COALESCE(m.tags, '[]'::jsonb) @> jsonb_build_array(t)
+        ), '[]'::jsonb)
+    FROM unnest(
+        CAST(:ids AS uuid[]),
+        CAST(:hits AS integer[]),
+        CAST(:tags AS text[])
+    ) AS u(id, hits, tags)
+    WHERE m.id = u.id
+""")
+
+
+def _parse_extracted(mem_data: Any) -> Tuple[str, List[str]]:
+    """Content and tags from an extracted memory (dict {"content": ...} or plain string)"""
+    if isinstance(mem_data, str):
+        return mem_data.strip(), []
+    if isinstance(mem_data, dict):
+        return (mem_data.get("content") or "").strip(), mem_data.get("tags", [])
+    return "", []
+
+
+def _reinforce(memory: Memory):
+    """Boost salience of a new memory that was seen again before being stored"""
+    memory.salience = min(1.0, (memory.salience or 0.5) + DUPLICATE_BOOST)
+    memory.last_seen_at = datetime.utcnow()
+    memory.updated_at = datetime.utcnow()
+
+
+def _merge_tags(memory: Memory, tags: List[str]):
+    """Add tags of a reworded duplicate to the memory it was merged into"""
+    merged = list(memory.tags or [])
+    merged.extend(t for t in tags or [] if t not in merged)
+    if len(merged) != len(memory.tags or []):
+        memory.tags = merged
+
+
+def _new_memory(
+    owner_id: str,
+    user_id: str,
+    content: str,
+    simhash: int,
+    tags: List[str],
+    source_app: Optional[str],
+    metadata: Optional[Dict[str, Any]]
+) -> Memory:
+    """Build a Memory row with sector, decay and initial salience derived from content"""
+    sector, additional_sectors, confidence = classify_sector(content)
+    decay_lambda = get_sector_decay_lambda(sector)
+    # Same as Mac app: 0.4 + 0.1 per additional sector
+    initial_salience = calculate_initial_salience(sector, additional_sectors)
+    now = datetime.utcnow()
+    
+    return Memory(
+        id=str(uuid.uuid4()),
+        content=content,
+        simhash=simhash_to_hex(simhash),
+        simhash_int=simhash,
+        fingerprint=simhash,
+        sector=sector,
+        salience=initial_salience,
+        decay_lambda=decay_lambda,
+        segment=0,  # TODO: Implement segment rotation
+        tags=tags,
+        extra_metadata=metadata or {},
+        source_app=source_app,
+        user_id=user_id,
+        owner_id=owner_id,  # UniMemory user who owns this memory
+        is_active=True,
+        created_at=now,
+        updated_at=now,
+        last_seen_at=now
+    )
+
+
+def _attach_embedding(memory: Memory, embedding: Optional[List[float]], model_name: str):
+    if embedding is None:
+        return  # Nothing to compare by; found through keyword search only
+    memory.embedding = embedding
+    if settings.TWO_STAGE_SEARCH:
+        memory.embedding_prefix = truncate_normalize(embedding, settings.EMBEDDING_PREFIX_DIM)
+    if settings.BINARY_PREFILTER != "off":
+        memory.embedding_bits = binary_code(embedding)
+    memory.embedding_model = model_name
+
+
+def raw_content_hash(content: str) -> str:
+    """SHA-256 of the exact raw input, the memoization key"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _processing_log(
+    owner_id: str,
+    user_id: str,
+    digest: str,
+    worthiness: Dict[str, Any],
+    memory_ids: List[str]
+) -> ProcessingLog:
+    worth = worthiness.get("is_worth_remembering", False)
+    return ProcessingLog(
+        id=str(uuid.uuid4()),
+        raw_content_hash=digest,
+        owner_id=owner_id,
+        user_id=user_id,
+        processed_at=datetime.utcnow(),
+        was_worth_remembering=worth,
+        reason=worthiness.get("reason") if worth else worthiness.get("reason", "Not worth remembering"),
+        extracted_count=len(memory_ids),
+        memory_ids=memory_ids
+    )
+
+
+async def _memoized_results(
+    session: AsyncSession,
+    owner_id: str,
+    keys: List[Tuple[str, str]]
+) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Earlier outcomes for (user_id, raw hash) pairs seen within INGEST_MEMO_TTL_SECONDS
+    
+    Unworthy inputs replay the cached verdict; processed inputs replay the
+    memory ids they produced, unless those memories have since been deleted.
+    """
+    if settings.INGEST_MEMO_TTL_SECONDS <= 0 or not keys:
+        return {}
+    
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.INGEST_MEMO_TTL_SECONDS)
+    stmt = select(ProcessingLog).where(
+        ProcessingLog.owner_id == owner_id,
+        ProcessingLog.user_id.in_({user_id for user_id, _ in keys}),
+        ProcessingLog.raw_content_hash.in_({digest for _, digest in keys}),
+        ProcessingLog.processed_at >= cutoff
+    ).order_by(ProcessingLog.processed_at.desc())
+    result = await session.execute(stmt)
+    
+    wanted = set(keys)
+    latest: Dict[Tuple[str, str], ProcessingLog] = {}
+    for log in result.scalars().all():
+        key = (log.user_id, log.raw_content_hash)
+        if key in wanted and key not in latest:
+            latest[key] = log
+    
+    memory_ids = {memory_id for log in latest.values() for memory_id in (log.memory_ids or [])}
+    active = set()
+    if memory_ids:
+        active_stmt = select(Memory.id).where(
+            Memory.id.in_(memory_ids),
+            Memory.owner_id == owner_id,
+            Memory.is_active == True
+        )
+        active = {str(memory_id) for memory_id in (await session.execute(active_stmt)).scalars().all()}
+    
+    memoized = {}
+    for key, log in latest.items():
+        if not log.was_worth_remembering:
+            memoized[key] = {
+                "was_worth_remembering": False,
+                "reason": log.reason,
+                "extracted_count": 0,
+                "memoized": True
+            }
+            continue
+        
+        remaining = [memory_id for memory_id in (log.memory_ids or []) if memory_id in active]
+        if not remaining:
+            continue  # Memories were deleted since; process the input again
+        memoized[key] = {
+            "was_worth_remembering": True,
+            "reason": log.reason,
+            "extracted_count": len(remaining),
+            "memories": [{"id": memory_id, "was_deduplicated": True} for memory_id in remaining],
+            "memoized": True
+        }
+    
+    return memoized
+
+
+async def ingest_memory(
+    session: AsyncSession,
+    owner_id: str,
+    content: str,
+    source_app: Optional[str] = None,
+    user_id: Optional[str] = "anonymous",
+    metadata: Optional[Dict[str, Any]] = None,
+    progress: Optional[ProgressCallback] = None
+) -> Dict[str, Any]:
+    """
+    Run the full add-memory pipeline for one piece of content
+    
+    Flow:
+    0. Replay the outcome of an identical recent input (SHA-256 of raw content)
+    1. Check if worth remembering (LLM)
+    2. Extract structured memories (LLM)
+    3. Generate embeddings (one batch, concurrently with step 4)
+    4. Check for duplicates (SimHash, then embeddings with SEMANTIC_DEDUP)
+    5. Store in database (atomic UPDATE for duplicates, upsert for new memories)
+    6. Create waypoint links
+    """
+    async def report(stage: str, **counters):
+        if progress is not None:
+            await progress(stage, **counters)
+    
+    extractor = get_extractor()
+    
+    # Step 0: Replay the outcome of an identical recent input
+    digest = raw_content_hash(content)
+    memoized = await _memoized_results(session, owner_id, [(user_id, digest)])
+    if (user_id, digest) in memoized:
+        return memoized[(user_id, digest)]
+    
+    # Step 1-2: Check worthiness and extract memories
+    await report("analyzing")
+    worthiness, extracted = await extractor.analyze(content)
+    if not worthiness.get("is_worth_remembering", False):
+        # Log as not worth remembering
+        session.add(_processing_log(owner_id, user_id, digest, worthiness, []))
+        await session.commit()
+        
+        return {
+            "was_worth_remembering": False,
+            "reason": worthiness.get("reason"),
+            "extracted_count": 0
+        }
+    
+    if not extracted:
+        return {
+            "was_worth_remembering": True,
+            "reason": "Worth remembering but extraction failed",
+            "extracted_count": 0
+        }
+    
+    # Step 3-6: Embed, deduplicate and store all extracted memories together
+    candidates = []
+    for mem_data in extracted:
+        mem_content, tags = _parse_extracted(mem_data)
+        if mem_content:
+            candidates.append({
+                "user_id": user_id,
+                "content": mem_content,
+                "tags": tags,
+                "source_app": source_app,
+                "metadata": metadata
+            })
+    
+    await report("storing", total=len(candidates))
+    stored = await _store_candidates(session, owner_id, candidates)
+    saved_memories = [
+        {"id": memory_id, "was_deduplicated": deduplicated}
+        for memory_id, deduplicated in stored
+    ]
+    
+    # Log processing (committed together with the memories)
+    session.add(_processing_log(
+        owner_id, user_id, digest, worthiness, [m["id"] for m in saved_memories]
+    ))
+    await session.commit()
+    
+    return {
+        "was_worth_remembering": True,
+        "reason": worthiness.get("reason"),
+        "extracted_count": len(saved_memories),
+        "memories": saved_memories
+    }
+
+
+async def _load_duplicate_candidates(
+    session: AsyncSession,
+    owner_id: str,
+    user_ids: List[str],
+    simhashes: List[int]
+) -> Dict[str, List[Memory]]:
+    """
+    Possible duplicates from each end-user's whole corpus, in one query
+    
+    Rows sharing a SimHash band with some candidate are found through the
+    band indexes and kept if within DUPLICATE_MAX_DISTANCE (XOR + popcount
+    in SQL). Rows whose integer SimHash has not been backfilled yet keep the
+    old bound: the DUPLICATE_CANDIDATES most salient, compared by hex string.
+    """
+    scope = [
+        Memory.is_active == True,
+        Memory.owner_id == owner_id,
+        Memory.user_id.in_(user_ids)
+    ]
+    
+    unique_hashes = sorted(set(simhashes))
+    bands = [simhash_bands(h) for h in unique_hashes]
+    band_match = or_(*[
+        simhash_band_sql(Memory.simhash_int, k).in_(sorted({b[k] for b in bands}))
+        for k in range(SIMHASH_BANDS)
+    ])
+    candidate_hashes = func.unnest(
+        cast(array(unique_hashes), ARRAY(BigInteger))
+    ).table_valued("h").render_derived()
+    near_candidate = select(literal(1)).select_from(candidate_hashes).where(
+        simhash_distance_sql(Memory.simhash_int, candidate_hashes.c.h) <= DUPLICATE_MAX_DISTANCE
+    ).exists()
+    indexed = select(Memory.id).where(*scope, band_match, near_candidate)
+    
+    ranked_legacy = select(
+        Memory.id,
+        func.row_number().over(
+            partition_by=Memory.user_id,
+            order_by=Memory.salience.desc()
+        ).label("rank")
+    ).where(
+        *scope,
+        Memory.simhash_int.is_(None),
+        Memory.simhash.isnot(None)
+    ).subquery()
+    legacy = select(ranked_legacy.c.id).where(ranked_legacy.c.rank <= DUPLICATE_CANDIDATES)
+    
+    stmt = select(Memory).where(
+        Memory.id.in_(union_all(indexed, legacy))
+    ).order_by(Memory.salience.desc())
+    result = await session.execute(stmt)
+    
+    by_user: Dict[str, List[Memory]] = defaultdict(list)
+    for memory in result.scalars().all():
+        by_user[memory.user_id].append(memory)
+    return by_user
+
+
+def _collapse_semantic(
+    candidates: List[Dict[str, Any]],
+    embeddings: List[Tuple[List[float], Any]],
+    matches: List[Any]
+):
+    """
+    Point reworded repeats within a batch at their first occurrence
+    
+    Only candidates still marked new (match is None) that have an embedding
+    are compared, per end-user, by cosine similarity of their embeddings.
+    Updates matches in place with the index of the earlier candidate.
+    """
+    by_user: Dict[str, List[int]] = defaultdict(list)
+    for n, match in enumerate(matches):
+        if match is None and embeddings[n][0] is not None:
+            by_user[candidates[n]["user_id"]].append(n)
+    
+    for indices in by_user.values():
+        if len(indices) < 2:
+            continue
+        vectors = np.array([embeddings[n][0] for n in indices], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        similarities = (vectors / norms) @ (vectors / norms).T
+        
+        kept: List[int] = []  # positions in indices
+        for i, n in enumerate(indices):
+            earlier = next((
+                k for k in kept if similarities[i, k] >= settings.SEMANTIC_DEDUP_THRESHOLD
+            ), None)
+            if earlier is None:
+                kept.append(i)
+            else:
+                matches[n] = indices[earlier]
+
+
+async def _nearest_memory(
+    session: AsyncSession,
+    owner_id: str,
+    user_id: str,
+    embedding: List[float],
+    model_name: str
+) -> Optional[Memory]:
+    """
+    Closest stored memory of an end-user if within the semantic dedup threshold
+    
+    One nearest-neighbour probe ordered by cosine distance, served by the
+    embedding ANN index, over memories embedded with the same model. Only
+    the id and distance are read; the row is loaded for a match alone.
+    """
+    distance = Memory.embedding.cosine_distance(embedding)
+    stmt = select(Memory.id, distance.label("distance")).where(
+        Memory.is_active == True,
+        Memory.owner_id == owner_id,
+        Memory.user_id == user_id,
+        Memory.embedding_model == model_name,
+        Memory.embedding.isnot(None)
+    ).order_by(distance).limit(1)
+    row = (await session.execute(stmt)).first()
+    # NaN (a zero vector on either side) never counts as a match
+    if row is None or not row.distance <= 1 - settings.SEMANTIC_DEDUP_THRESHOLD:
+        return None
+    return await session.get(Memory, row.id)
+
+
+async def _reinforce_stored(session: AsyncSession, boosts: Dict[str, list]):
+    """
+    Apply salience boosts (and tag merges) to stored memories atomically
+    
+    boosts maps memory_id -> [hits, tags]. Computed in SQL from the current
+    row, so concurrent reinforcements of the same memory all count.
+    """
+    if not boosts:
+        return
+    ids = sorted(boosts)
+    await session.execute(REINFORCE_SQL, {
+        "boost": DUPLICATE_BOOST,
+        "ids": ids,
+        "hits": [boosts[memory_id][0] for memory_id in ids],
+        "tags": [json.dumps(boosts[memory_id][1]) for memory_id in ids],
+    })
+
+
+async def _upsert_memories(
+    session: AsyncSession,
+    memories: List[Memory]
+) -> Dict[Tuple[str, int], Tuple[str, bool]]:
+    """
+    Insert new memories in one statement, race-free
+    
+    INSERT ... ON CONFLICT on the (owner_id, user_id, fingerprint) unique
+    index: when a parallel ingestion stored the same fingerprint since the
+    duplicate lookup, that row is reinforced instead of a twin being added.
+    
+    Returns (memory_id, inserted) keyed by (user_id, fingerprint).
+    """
+    if not memories:
+        return {}
+    
+    # Same lock order across concurrent batches that share fingerprints
+    memories = sorted(memories, key=lambda m: (m.user_id, m.fingerprint))
+    table = Memory.__table__
+    columns = [
+        c.name for c in table.columns
+        if any(getattr(m, c.name) is not None for m in memories)
+    ]
+    stmt = pg_insert(table).values([
+        {name: getattr(m, name) for name in columns} for m in memories
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.owner_id, table.c.user_id, table.c.fingerprint],
+        index_where=table.c.is_active == True,
+        set_={
+            "salience": func.least(1.0, func.coalesce(table.c.salience, 0.5) + DUPLICATE_BOOST),
+            "last_seen_at": func.now(),
+            "updated_at": func.now()
+        }
+    ).returning(
+        table.c.id,
+        table.c.user_id,
+        table.c.fingerprint,
+        # xmax is only set on rows updated by the conflict clause
+        literal_column("xmax = 0").label("inserted")
+    )
+    result = await session.execute(stmt)
+    return {
+        (row.user_id, row.fingerprint): (str(row.id), row.inserted)
+        for row in result.all()
+    }
+
+
+async def _store_candidates(
+    session: AsyncSession,
+    owner_id: str,
+    candidates: List[Dict[str, Any]]
+) -> List[Tuple[str, bool]]:
+    """
+    Deduplicate, embed and store extracted memories in one pass
+    
+    candidates are dicts with user_id, content, tags, source_app and metadata.
+    The embedding batch is requested up front and runs while SimHashes are
+    computed and duplicates are looked up (one query); embeddings of texts
+    that turn out to be duplicates are discarded. Stored duplicates are
+    reinforced with one UPDATE, new memories are upserted with one INSERT
+    (safe against parallel ingestion) and waypoints follow in one flush;
+    the caller commits.
+    
+    With SEMANTIC_DEDUP, memories that SimHash considers new are then
+    compared by embedding: reworded repeats within the batch are collapsed
+    first, and each remaining one probes the ANN index for a stored memory
+    above SEMANTIC_DEDUP_THRESHOLD, which is reinforced instead.
+    
+    Returns (memory_id, was_deduplicated) per candidate, in order.
+    """
+    if not candidates:
+        return []
+    
+    embedding_service = get_embedding_service()
+    embedding_task = asyncio.create_task(
+        embedding_service.embed_batch([c["content"] for c in candidates])
+    )
+    try:
+        simhashes = compute_simhashes([c["content"] for c in candidates])
+        existing_by_user = await _load_duplicate_candidates(
+            session, owner_id, sorted({c["user_id"] for c in candidates}), simhashes
+        )
+        
+        # Match against stored memories, then against earlier candidates
+        batch_by_user: Dict[str, List[Tuple[int, int]]] = defaultdict(list)  # simhash, candidate index
+        matches: List[Any] = []  # Stored Memory, index of an earlier candidate, or None if new
+        for n, (candidate, simhash) in enumerate(zip(candidates, simhashes)):
+            user_id = candidate["user_id"]
+            match = next((
+                em for em in existing_by_user.get(user_id, [])
+                if hamming_distance(
+                    simhash, em.simhash_int if em.simhash_int is not None else em.simhash
+                ) <= DUPLICATE_MAX_DISTANCE
+            ), None)
+            if match is None:
+                match = next((
+                    earlier for h, earlier in batch_by_user[user_id]
+                    if hamming_distance(simhash, h) <= DUPLICATE_MAX_DISTANCE
+                ), None)
+            if match is None:
+                batch_by_user[user_id].append((simhash, n))
+            matches.append(match)
+        
+        # Classify new memories while the embeddings are in flight
+        new_memories: Dict[int, Memory] = {
+            n: _new_memory(
+                owner_id=owner_id,
+                user_id=candidate["user_id"],
+                content=candidate["content"],
+                simhash=simhash,
+                tags=candidate["tags"],
+                source_app=candidate.get("source_app"),
+                metadata=candidate.get("metadata")
+            )
+            for n, (candidate, simhash, match) in enumerate(zip(candidates, simhashes, matches))
+            if match is None
+        }
+        
+        embeddings = await embedding_task
+    finally:
+        embedding_task.cancel()
+    
+    reworded = set()  # Candidates matched by embedding rather than SimHash
+    if settings.SEMANTIC_DEDUP:
+        unmatched = [
+            n for n, match in enumerate(matches) if match is None and embeddings[n][0] is not None
+        ]
+        _collapse_semantic(candidates, embeddings, matches)
+        await tune_scoped_ann(session)
+        for n in unmatched:
+            if matches[n] is None:
+                matches[n] = await _nearest_memory(
+                    session, owner_id, candidates[n]["user_id"], embeddings[n][0],
+                    embedding_service.model_name
+                )
+        reworded = {n for n in unmatched if matches[n] is not None}
+        # Repeats of a candidate that turned out to be stored follow it there
+        for n, match in enumerate(matches):
+            if isinstance(match, int) and matches[match] is not None:
+                matches[n] = matches[match]
+                if match in reworded:
+                    reworded.add(n)
+
+    # Duplicates of new memories adjust them before insert; duplicates of
+    # stored memories become one atomic UPDATE
+    boosts: Dict[str, list] = {}  # memory_id -> [hits, tags]
+    for n, match in enumerate(matches):
+        if match is None:
+            continue
+        new_memories.pop(n, None)
+        tags = candidates[n]["tags"] if n in reworded else []
+        if isinstance(match, int):
+            _reinforce(new_memories[match])
+            _merge_tags(new_memories[match], tags)
+        else:
+            entry = boosts.setdefault(str(match.id), [0, []])
+            entry[0] += 1
+            entry[1].extend(t for t in tags or [] if t not in entry[1])
+    await _reinforce_stored(session, boosts)
+    
+    for n, memory in new_memories.items():
+        _attach_embedding(memory, embeddings[n][0], embedding_service.model_name)
+    upserted = await _upsert_memories(session, list(new_memories.values()))
+    
+    stored = []
+    for n, match in enumerate(matches):
+        if match is not None and not isinstance(match, int):
+            stored.append((str(match.id), True))
+            continue
+        memory = new_memories[n if match is None else match]
+        memory_id, inserted = upserted[(memory.user_id, memory.fingerprint)]
+        stored.append((memory_id, match is not None or not inserted))
+    
+    # Memories that lost the insert race already have their waypoints
+    inserted_ids = {memory_id for memory_id, inserted in upserted.values() if inserted}
+    await create_waypoints_for_memories(
+        session,
+        owner_id,
+        [
+            (m.id, embeddings[n][0], m.user_id) for n, m in new_memories.items()
+            if m.id in inserted_ids and embeddings[n][0] is not None
+        ]
+    )
+    await session.flush()
+    
+    return stored
+
+
+async def ingest_batch(
+    session: AsyncSession,
+    owner_id: str,
+    items: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Run the add-memory pipeline for many contents at once
+    
+    items are dicts with content, source_app, user_id and metadata. Worthiness
+    and extraction are batched into a few LLM calls, embeddings go through one
+    embed_batch, duplicates are checked with one query, and memories,
+    waypoints and logs are written with a single commit.
+    
+    Returns one result per item, in order, shaped like ingest_memory's.
+    """
+    extractor = get_extractor()
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    contents = [(item.get("content") or "").strip() for item in items]
+    user_ids = [item.get("user_id") or "anonymous" for item in items]
+    logs = []
+    
+    digests = [raw_content_hash(content) for content in contents]
+    keys = list(zip(user_ids, digests))
+    memoized = await _memoized_results(
+        session, owner_id, [keys[i] for i, content in enumerate(contents) if content]
+    )
+    
+    pending = []
+    repeats = []  # (item index, earlier item with the same input)
+    first_seen: Dict[Tuple[str, str], int] = {}
+    for i, content in enumerate(contents):
+        if not content:
+            results[i] = {
+                "was_worth_remembering": False,
+                "reason": "Content cannot be empty",
+                "extracted_count": 0
+            }
+        elif keys[i] in memoized:
+            results[i] = memoized[keys[i]]
+        elif keys[i] in first_seen:
+            repeats.append((i, first_seen[keys[i]]))
+        else:
+            first_seen[keys[i]] = i
+            pending.append(i)
+    
+    # Step 1-2: Check worthiness and extract memories
+    analyses = await extractor.analyze_batch([contents[i] for i in pending])
+    worthiness = {i: check for i, (check, _) in zip(pending, analyses)}
+    extracted_by_item = {i: mem_list for i, (_, mem_list) in zip(pending, analyses)}
+    worth = []
+    for i in pending:
+        if worthiness[i].get("is_worth_remembering", False):
+            worth.append(i)
+            continue
+        logs.append(_processing_log(owner_id, user_ids[i], digests[i], worthiness[i], []))
+        results[i] = {
+            "was_worth_remembering": False,
+            "reason": worthiness[i].get("reason"),
+            "extracted_count": 0
+        }
+    
+    candidates = []
+    owners = []  # Item index of each candidate
+    for i in worth:
+        mem_list = extracted_by_item[i]
+        if not mem_list:
+            results[i] = {
+                "was_worth_remembering": True,
+                "reason": "Worth remembering but extraction failed",
+                "extracted_count": 0
+            }
+            continue
+        results[i] = {
+            "was_worth_remembering": True,
+            "reason": worthiness[i].get("reason"),
+            "extracted_count": 0,
+            "memories": []
+        }
+        for mem_data in mem_list:
+            mem_content, tags = _parse_extracted(mem_data)
+            if mem_content:
+                candidates.append({
+                    "user_id": user_ids[i],
+                    "content": mem_content,
+                    "tags": tags,
+                    "source_app": items[i].get("source_app"),
+                    "metadata": items[i].get("metadata")
+                })
+                owners.append(i)
+    
+    # Step 3-5: Embed, deduplicate and store all extracted memories together
+    stored = await _store_candidates(session, owner_id, candidates)
+    for i, (memory_id, deduplicated) in zip(owners, stored):
+        results[i]["memories"].append({
+            "id": memory_id,
+            "was_deduplicated": deduplicated
+        })
+    
+    for i in worth:
+        if "memories" in results[i]:
+            results[i]["extracted_count"] = len(results[i]["memories"])
+            logs.append(_processing_log(
+                owner_id, user_ids[i], digests[i], worthiness[i],
+                [m["id"] for m in results[i]["memories"]]
+            ))
+    
+    # Identical inputs within the batch share the first one's outcome
+    for i, first in repeats:
+        results[i] = dict(results[first], memoized=True)
+        if "memories" in results[i]:
+            results[i]["memories"] = [
+                {"id": m["id"], "was_deduplicated": True} for m in results[first]["memories"]
+            ]
+    
+    session.add_all(logs)
+    await session.commit()
+    
+    return results
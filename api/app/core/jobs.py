@@ -0,0 +1,191 @@
+"""
+Durable ingestion queue backed by the ingestion_jobs table
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+from sqlalchemy import text, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import IngestionJob
+from app.core.ingest import ingest_memory
+from app.core.admission import Overloaded
+from app.config import settings
+
+
+# Give up on jobs whose last attempt crashed and used up the retry budget
+REAP_SQL = text("""
+    UPDATE ingestion_jobs
+    SET status = 'failed', finished_at = now(), error = 'Worker lease expired after final attempt'
+    WHERE status = 'running'
+      AND started_at < now() - make_interval(secs => :lease)
+      AND attempts >= :max_attempts
+""")
+
+# Claim the oldest runnable job; SKIP LOCKED lets workers in every process share the table
+CLAIM_SQL = text("""
+    UPDATE ingestion_jobs
+    SET status = 'running', started_at = now(), attempts = attempts + 1
+    WHERE id = (
+        SELECT id FROM ingestion_jobs
+        WHERE (status = 'queued'
+               OR (status = 'running' AND started_at < now() - make_interval(secs => :lease)))
+          AND attempts < :max_attempts
+        ORDER BY created_at
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, owner_id, payload, attempts
+""")
+
+
+async def enqueue_ingestion(session: AsyncSession, owner_id: str, payload: Dict[str, Any]) -> IngestionJob:
+    """Persist a job and wake a local worker"""
+    job = IngestionJob(owner_id=owner_id, payload=payload, status="queued", progress={"stage": "queued"})
+    session.add(job)
+    await session.commit()
+    ingestion_workers.notify()
+    return job
+
+
+class IngestionWorkerPool:
+    """Fixed number of async workers draining the ingestion job table"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+
+    def notify(self):
+        """Wake idle workers (a job was just enqueued)"""
+        self._wakeup.set()
+
+    async def _claim(self) -> Optional[Any]:
+        params = {
+            "lease": settings.INGEST_JOB_LEASE_SECONDS,
+            "max_attempts": settings.INGEST_JOB_MAX_ATTEMPTS,
+        }
+        async with AsyncSessionLocal() as session:
+            await session.execute(REAP_SQL, params)
+            row = (await session.execute(CLAIM_SQL, params)).first()
+            await session.commit()
+        return row
+
+    async def _update(self, job_id: str, claim: int, **values) -> bool:
+        """Update a job only while this worker's claim (its attempts count) still stands"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(IngestionJob).where(
+                    IngestionJob.id == job_id,
+                    IngestionJob.status == "running",
+                    IngestionJob.attempts == claim
+                ).values(**values)
+            )
+            await session.commit()
+        return result.rowcount > 0
+
+    async def _heartbeat(self, job_id: str, attempts: int):
+        """Renew the lease (started_at) while the job runs, however long its stages take"""
+        while True:
+            await asyncio.sleep(settings.INGEST_JOB_LEASE_SECONDS / 3)
+            try:
+                if not await self._update(job_id, attempts, started_at=func.now()):
+                    return
+            except Exception as e:
+                print(f"[Jobs] Failed to renew lease of job {job_id}: {e}")
+
+    async def _process(self, job_id: str, owner_id: str, payload: Dict[str, Any], attempts: int):
+        async def progress(stage: str, **counters):
+            await self._update(job_id, attempts, progress={"stage": stage, **counters}, started_at=func.now())
+
+        self.active += 1
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, attempts))
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await ingest_memory(
+                    session=session,
+                    owner_id=owner_id,
+                    content=payload["content"],
+                    source_app=payload.get("source_app"),
+                    user_id=payload.get("user_id") or "anonymous",
+                    metadata=payload.get("metadata"),
+                    progress=progress
+                )
+            completed = await self._update(
+                job_id,
+                attempts,
+                status="completed",
+                result=result,
+                error=None,
+                progress={"stage": "completed"},
+                finished_at=func.now()
+            )
+            if completed:
+                self.completed += 1
+            else:
+                print(f"[Jobs] Ingestion job {job_id} was reclaimed by another worker (attempt {attempts})")
+        except Overloaded as e:
+            # Shed by admission control: requeue without using up an attempt, then back off
+            await self._update(job_id, attempts, status="queued", attempts=IngestionJob.attempts - 1)
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            print(f"[Jobs] Ingestion job {job_id} failed (attempt {attempts}): {e}")
+            if attempts >= settings.INGEST_JOB_MAX_ATTEMPTS:
+                await self._update(job_id, attempts, status="failed", error=str(e), finished_at=func.now())
+                self.failed += 1
+            else:
+                await self._update(job_id, attempts, status="queued", error=str(e))
+                self.retried += 1
+        finally:
+            heartbeat.cancel()
+            self.active -= 1
+
+    async def _run(self):
+        while True:
+            # Cleared before claiming, so an enqueue that lands while the claim
+            # query runs still wakes this worker instead of waiting out the poll
+            self._wakeup.clear()
+            try:
+                row = await self._claim()
+            except Exception as e:
+                print(f"[Jobs] Failed to claim job: {e}")
+                row = None
+
+            if row is None:
+                # Idle: wait for an enqueue in this process or poll for other producers
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.INGEST_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(str(row.id), str(row.owner_id), row.payload, row.attempts)
+
+    def start(self):
+        """Start the worker tasks"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel workers; interrupted jobs are reclaimed once their lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        return {
+            "workers": len(self._tasks),
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+
+ingestion_workers = IngestionWorkerPool(workers=settings.INGEST_WORKERS)
@@ -0,0 +1,66 @@
+"""
+Bounded thread pool for CPU-bound and blocking calls
+"""
+from typing import Any, Callable, Dict, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class BlockingPool:
+    """
+    Run blocking callables off the event loop with bounded concurrency
+
+    Callers beyond max_workers wait on a semaphore rather than piling up
+    inside the executor, so the number of waiters is observable.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._semaphore = asyncio.Semaphore(max_workers)
+        self.queued = 0
+        self.max_queued = 0
+        self.running = 0
+        self.completed = 0
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) in the pool and await its result"""
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        return {
+            "max_workers": self.max_workers,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+        }
+
+
+# bcrypt hashing and Firebase token verification
+auth_pool = BlockingPool("auth", max_workers=settings.AUTH_POOL_WORKERS)
@@ -0,0 +1,152 @@
+"""
+Local worthiness pre-filter for obviously unworthy input
+
+Rejects greetings, acknowledgements, emoji and typing noise before they
+reach the LLM. Rules are deliberately conservative: anything that could
+carry a fact (names, numbers, unknown words) is passed through.
+"""
+from typing import Any, Dict, Optional, Set
+import hashlib
+import re
+
+from app.core.simhash import canonical_token_set
+from app.config import settings
+
+
+# Words (of any length) that carry nothing on their own
+FILLER_WORDS = {
+    "hi", "hii", "hey", "heya", "hello", "hiya", "yo", "sup", "howdy", "greetings",
+    "ok", "okay", "okey", "kk", "k", "alright", "sure", "yes", "yeah", "yep", "yup", "no", "nope", "nah",
+    "thanks", "thank", "thx", "ty", "tysm", "cheers", "welcome", "np",
+    "bye", "goodbye", "cya", "later", "see", "gn", "gm", "good", "morning", "night", "evening", "afternoon",
+    "lol", "lmao", "rofl", "haha", "hahaha", "hehe", "xd", "wow", "oh", "ah", "hmm", "hm", "um", "uh", "oops",
+    "cool", "nice", "great", "awesome", "perfect", "fine", "got", "it", "you", "too", "so", "much", "very",
+    "how", "are", "r", "u", "ya", "doing", "what", "whats", "up", "there", "all", "a", "the",
+    "typing", "loading", "waiting", "brb", "afk", "test", "testing",
+}
+
+# Longest input the greeting/acknowledgement rule applies to
+MAX_FILLER_WORDS = 8
+
+_WORD_PATTERN = re.compile(r"[^a-z0-9]+")
+_LAUGH_PATTERN = re.compile(r"^(?:ha|he|hi){2,}h?$|^lo(?:lo)*l$")
+_VOWELS = set("aeiouy")
+
+
+def _words(text: str) -> list:
+    return [w for w in _WORD_PATTERN.split(text.lower()) if w]
+
+
+def _is_filler(word: str) -> bool:
+    return word in FILLER_WORDS or bool(_LAUGH_PATTERN.match(word))
+
+
+def _is_keyboard_mash(token: str) -> bool:
+    """Long token with no vowels at all, or one or two characters repeated"""
+    if token.isdigit():
+        return False
+    if len(token) >= 6 and len(set(token)) <= 2:
+        return True
+    return len(token) >= 8 and not any(c in _VOWELS for c in token)
+
+
+def classify(text: str) -> Optional[str]:
+    """Reason the text is obviously not worth remembering, or None if unsure"""
+    if not any(c.isalnum() for c in text):
+        return "No text content (emoji, punctuation or whitespace)"
+    
+    if any(c.isalpha() and not c.isascii() for c in text):
+        return None  # Rules below only know English; leave other scripts to the LLM
+    
+    if any(c.isdigit() for c in text):
+        return None  # Numbers usually mean dates, ages, amounts
+    
+    words = _words(text)
+    if len(words) <= MAX_FILLER_WORDS and all(_is_filler(w) for w in words):
+        return "Greeting, acknowledgement or transient state"
+    
+    tokens: Set[str] = canonical_token_set(text)
+    if len(words) == 1 and len(tokens) == 1 and _is_keyboard_mash(words[0]):
+        return "Random characters or gibberish"
+    
+    return None
+
+
+class WorthinessPrefilter:
+    """
+    Rule-based stage ahead of the LLM worthiness check
+    
+    Modes: "off", "shadow" (classify and compare with the LLM verdict, but
+    always ask the LLM) and "enforce" (skip the LLM for rejected input).
+    """
+    
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.checked = 0
+        self.rejected = 0
+        self.llm_calls_saved = 0
+        self.shadow_agreed = 0
+        self.shadow_disagreed = 0  # Pre-filter rejected, LLM said worth remembering
+        self.shadow_missed = 0  # Pre-filter passed, LLM said not worth remembering
+    
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("shadow", "enforce")
+    
+    def check(self, text: str) -> Optional[Dict[str, Any]]:
+        """Worthiness verdict when enforcing and the text is rejected, else None"""
+        if not self.enabled:
+            return None
+        
+        self.checked += 1
+        reason = classify(text)
+        if reason is None:
+            return None
+        
+        self.rejected += 1
+        if self.mode != "enforce":
+            return None
+        
+        self.llm_calls_saved += 1
+        return {
+            "is_worth_remembering": False,
+            "reason": reason,
+            "suggested_types": [],
+            "prefiltered": True
+        }
+    
+    def record_shadow(self, text: str, llm_worthiness: Dict[str, Any]):
+        """Compare the local verdict with the LLM's (shadow mode only)"""
+        if self.mode != "shadow":
+            return
+        
+        reason = classify(text)
+        rejected = reason is not None
+        llm_rejected = not llm_worthiness.get("is_worth_remembering", False)
+        if rejected == llm_rejected:
+            self.shadow_agreed += 1
+        elif rejected:
+            self.shadow_disagreed += 1
+            # Rule and a content hash only: inputs are user data
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+            print(f"[Prefilter] Shadow disagreement (LLM kept input): rule={reason!r} "
+                  f"length={len(text)} sha256={digest}")
+        else:
+            self.shadow_missed += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        compared = self.shadow_agreed + self.shadow_disagreed + self.shadow_missed
+        return {
+            "mode": self.mode,
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "llm_calls_saved": self.llm_calls_saved,
+            "shadow_agreed": self.shadow_agreed,
+            "shadow_disagreed": self.shadow_disagreed,
+            "shadow_missed": self.shadow_missed,
+            "shadow_agreement_rate": self.shadow_agreed / compared if compared else 0.0,
+        }
+
+
+worthiness_prefilter = WorthinessPrefilter(mode=settings.PREFILTER_MODE)
@@ -0,0 +1,253 @@
+"""
+Retries, hedging and circuit breaking for provider calls
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from collections import deque
+import asyncio
+import random
+import time
+
+import openai
+
+from app.core.admission import Overloaded
+from app.config import settings
+
+T = TypeVar("T")
+
+# Transient provider failures worth another attempt
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APIConnectionError,  # Includes openai.APITimeoutError
+    openai.InternalServerError,
+)
+
+
+class CircuitOpen(Overloaded):
+    """Raised without calling the provider while its circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(name, retry_after, status_code=503)
+        self.args = (f"{name} provider circuit open, retry after {retry_after:.0f}s",)
+
+
+class CircuitBreaker:
+    """
+    Open after failure_threshold consecutive failures, then fail fast
+
+    After reset_seconds one trial call is let through (half-open); its
+    outcome closes the circuit or opens it for another period.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.opens = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpen unless a call may go out now; True if it is the half-open trial"""
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.short_circuited += 1
+        remaining = self.reset_seconds - (time.monotonic() - self.opened_at)
+        raise CircuitOpen(self.name, max(remaining, 1.0))
+
+    def release_trial(self):
+        """Trial call ended without an outcome (cancelled); let the next call try"""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._trial_in_flight:
+                self.opens += 1
+            self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Recent successful call latencies for the hedging threshold"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        if len(self._samples) < min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """
+    Run a provider call with per-attempt deadlines, jittered exponential
+    backoff between attempts, optional hedging and a circuit breaker
+
+    With hedging on, an attempt still running after the recent p95 latency
+    gets a second identical request; whichever finishes first wins and the
+    other is cancelled. Only use it for idempotent calls.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        attempt_timeout: float,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        hedge: bool,
+        hedge_min_samples: int,
+        breaker: CircuitBreaker
+    ):
+        self.name = name
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn() with retries; fn must start a fresh request each time it is called"""
+        self.calls += 1
+        for attempt in range(self.max_attempts):
+            trial = self.breaker.before_call()
+            try:
+                result = await self._attempt(fn)
+            except Overloaded as e:
+                # Provider rate limit: wait as told if that fits the retry budget
+                self.breaker.record_success()  # The provider answered; not an outage
+                if e.status_code != 429 or attempt + 1 >= self.max_attempts or e.retry_after > self.backoff_max:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(e.retry_after)
+                continue
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                if attempt + 1 >= self.max_attempts:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            except Exception:
+                # Bad requests and similar won't improve on retry
+                self.breaker.record_success()
+                self.failures += 1
+                raise
+            except BaseException:
+                # Cancelled (client disconnect, hedge loser): no verdict on the provider
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.monotonic()
+        deadline = start + self.attempt_timeout
+        hedge_delay = self.latency.percentile(0.95, self.hedge_min_samples) if self.hedge else None
+        hedged = hedge_delay is None or hedge_delay >= self.attempt_timeout
+        first = asyncio.ensure_future(fn())
+        pending = {first}
+        error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    raise asyncio.TimeoutError(f"{self.name} attempt exceeded {self.attempt_timeout}s")
+                wait_until = deadline if hedged else min(deadline, start + hedge_delay)
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait_until - now, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self.latency.record(time.monotonic() - start)
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+
+                if not hedged and pending and time.monotonic() >= start + hedge_delay:
+                    hedged = True
+                    self.hedges += 1
+                    pending.add(asyncio.ensure_future(fn()))
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p95_seconds": self.latency.percentile(0.95, 1),
+            "circuit": self.breaker.state,
+            "circuit_opens": self.breaker.opens,
+            "short_circuited": self.breaker.short_circuited,
+        }
+
+
+def _caller(name: str, attempt_timeout: float) -> ResilientCaller:
+    return ResilientCaller(
+        name,
+        attempt_timeout=attempt_timeout,
+        max_attempts=settings.PROVIDER_MAX_ATTEMPTS,
+        backoff_base=settings.PROVIDER_BACKOFF_BASE_SECONDS,
+        backoff_max=settings.PROVIDER_BACKOFF_MAX_SECONDS,
+        hedge=settings.PROVIDER_HEDGING,
+        hedge_min_samples=settings.PROVIDER_HEDGE_MIN_SAMPLES,
+        breaker=CircuitBreaker(
+            name,
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            reset_seconds=settings.CIRCUIT_RESET_SECONDS
+        )
+    )
+
+
+llm_resilience = _caller("llm", settings.LLM_ATTEMPT_TIMEOUT_SECONDS)
+embedding_resilience = _caller("embeddings", settings.EMBEDDING_ATTEMPT_TIMEOUT_SECONDS)
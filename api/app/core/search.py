@@ -4,15 +4,18 @@ Hybrid search logic (OpenMemory HSG-style)
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 import math
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from pgvector.sqlalchemy import Vector
 import numpy as np
 
 from app.db.models import Memory, Waypoint
 from app.core.embeddings import get_embedding_service
 from app.core.sector import classify_sector, get_sector_relationship_weight
 from app.core.simhash import canonical_token_set
+from app.core.vectors import (
+    to_float_list, truncate_normalize, binary_code, code_bytes, hamming_distances, tune_scoped_ann
+)
+from app.config import settings
 
 
 # Scoring weights (OpenMemory-style)
@@ -161,6 +164,104 @@ async def expand_via_waypoints(
     return expanded
 
 
+def reranked_vector_query(
+    conditions: list,
+    first_stage_order: Any,
+    pool_size: int,
+    query_embedding: List[float],
+    limit: int
+):
+    """
+    Pick pool_size candidates by a cheap ordering, rerank them by full cosine distance
+    """
+    candidates = (
+        select(Memory.id)
+        .where(*conditions)
+        .order_by(first_stage_order)
+        .limit(max(limit, pool_size))
+    )
+    return (
+        select(Memory)
+        .where(Memory.id.in_(candidates.scalar_subquery()))
+        .order_by(Memory.embedding.cosine_distance(query_embedding))
+        .limit(limit)
+    )
+
+
+def two_stage_vector_query(conditions: list, query_embedding: List[float], limit: int):
+    """
+    Matryoshka-style vector search
+    
+    The first pass ranks by the truncated, re-normalized prefix embedding
+    (small index, cheap distance) to pull TWO_STAGE_CANDIDATES rows; only
+    those are reranked by full-dimension cosine distance. Memories without
+    a prefix embedding (not yet backfilled) are not found in this mode.
+    """
+    prefix_query = truncate_normalize(query_embedding, settings.EMBEDDING_PREFIX_DIM)
+    return reranked_vector_query(
+        conditions + [Memory.embedding_prefix.isnot(None)],
+        Memory.embedding_prefix.cosine_distance(prefix_query),
+        settings.TWO_STAGE_CANDIDATES,
+        query_embedding,
+        limit
+    )
+
+
+def keyword_query(conditions: list, tokens: set, limit: int):
+    """
+    Candidates whose content mentions any query token, most salient first
+    
+    Used when no query embedding is available. Returns None if the query
+    has no usable tokens.
+    """
+    # Longest tokens are the most selective
+    terms = sorted(tokens, key=len, reverse=True)[:8]
+    if not terms:
+        return None
+    return select(Memory).where(
+        *conditions,
+        or_(*[Memory.content.ilike(f"%{term}%") for term in terms])
+    ).order_by(Memory.salience.desc()).limit(limit)
+
+
+def binary_prefilter_query(conditions: list, query_embedding: List[float], limit: int):
+    """Coarse Hamming-distance pass over sign-bit codes in SQL, exact cosine rerank"""
+    return reranked_vector_query(
+        conditions + [Memory.embedding_bits.isnot(None)],
+        Memory.embedding_bits.hamming_distance(binary_code(query_embedding)),
+        settings.BINARY_PREFILTER_CANDIDATES,
+        query_embedding,
+        limit
+    )
+
+
+async def binary_prefilter_ids(
+    session: AsyncSession,
+    conditions: list,
+    query_embedding: List[float],
+    pool_size: int
+) -> List[str]:
+    """
+    Coarse Hamming-distance pass in process
+    
+    Fetches only ids and packed codes (dim/8 bytes per row) for the scoped
+    memories and ranks them with NumPy XOR + popcount.
+    """
+    stmt = select(Memory.id, Memory.embedding_bits).where(
+        *conditions, Memory.embedding_bits.isnot(None)
+    )
+    rows = (await session.execute(stmt)).all()
+    if not rows:
+        return []
+    
+    distances = hamming_distances(binary_code(query_embedding), [code_bytes(code) for _, code in rows])
+    if len(rows) > pool_size:
+        nearest = np.argpartition(distances, pool_size)[:pool_size]
+    else:
+        nearest = range(len(rows))
+    return [rows[i][0] for i in nearest]
+
+
 async def hybrid_search(
     session: AsyncSession,
     query: str,
@@ -214,47 +315,82 @@ async def hybrid_search(
     # Step 3: Generate embedding
     embedding_service = get_embedding_service()
     try:
-        query_embedding, dim = await embedding_service.embed(core_query)
+        query_embedding, dim = await embedding_service.embed(core_query, priority="search")
     except Exception as e:
-        print(f"[Search] Embedding failed: {e}")
-        return []  # Fallback to keyword search if needed
+        # Shed, circuit open or provider down: rank by keywords, tags and recency instead
+        print(f"[Search] Embedding failed, falling back to keyword search: {e}")
+        query_embedding = None
     
-    # Step 4: Vector search (using pgvector)
-    stmt = select(Memory).where(
-        Memory.embedding.isnot(None),
+    # Step 4: Vector search (using pgvector), or keyword candidates without an embedding
+    conditions = [
         Memory.is_active == True
-    )
+    ]
     
     # Filter by owner_id for multi-tenant isolation (required)
     owner_id = filters.get("owner_id") if filters else None
     if owner_id:
-        stmt = stmt.where(Memory.owner_id == owner_id)
+        conditions.append(Memory.owner_id == owner_id)
     
     if user_id:
-        stmt = stmt.where(Memory.user_id == user_id)
+        conditions.append(Memory.user_id == user_id)
     
     if min_salience > 0:
-        stmt = stmt.where(Memory.salience >= min_salience)
-    
-    # Use pgvector cosine distance (pass list directly, not Vector wrapper)
-    stmt = stmt.order_by(Memory.embedding.cosine_distance(query_embedding)).limit(limit * 3)
-    
-    result = await session.execute(stmt)
-    vector_results = result.scalars().all()
+        conditions.append(Memory.salience >= min_salience)
+    
+    # Vectors from another embedding model (EMBEDDING_BACKEND changed) live in a different space
+    if query_embedding is not None:
+        conditions.append(Memory.embedding_model == embedding_service.model_name)
+    
+    if query_embedding is None:
+        stmt = keyword_query(conditions, canonical_token_set(core_query), limit * 3)
+        if stmt is None:
+            return []
+    elif settings.BINARY_PREFILTER == "sql":
+        conditions.append(Memory.embedding.isnot(None))
+        await tune_scoped_ann(session, settings.BINARY_PREFILTER_CANDIDATES)
+        stmt = binary_prefilter_query(conditions, query_embedding, limit * 3)
+    elif settings.BINARY_PREFILTER == "numpy":
+        conditions.append(Memory.embedding.isnot(None))
+        candidate_pool = await binary_prefilter_ids(
+            session, conditions, query_embedding, settings.BINARY_PREFILTER_CANDIDATES
+        )
+        # Exact rerank of the small pool here; ORDER BY <=> could make the
+        # planner walk the ANN index and drop pool rows it never reaches
+        stmt = None
+        pool = (await session.execute(
+            select(Memory).where(Memory.id.in_(candidate_pool))
+        )).scalars().all()
+        vector_results = sorted(
+            pool,
+            key=lambda mem: cosine_similarity(query_embedding, to_float_list(mem.embedding)),
+            reverse=True
+        )[:limit * 3]
+    elif settings.TWO_STAGE_SEARCH:
+        conditions.append(Memory.embedding.isnot(None))
+        await tune_scoped_ann(session, max(limit * 3, settings.TWO_STAGE_CANDIDATES))
+        stmt = two_stage_vector_query(conditions, query_embedding, limit * 3)
+    else:
+        # Use pgvector cosine distance (pass list directly, not Vector wrapper)
+        conditions.append(Memory.embedding.isnot(None))
+        await tune_scoped_ann(session, limit * 3)
+        stmt = select(Memory).where(*conditions).order_by(
+            Memory.embedding.cosine_distance(query_embedding)
+        ).limit(limit * 3)
+    
+    if stmt is not None:
+        result = await session.execute(stmt)
+        vector_results = result.scalars().all()
     
     # Calculate average similarity for confidence check
     similarities = []
     candidate_ids = []
     for mem in vector_results:
-        if mem.embedding is not None:
-            # Convert pgvector Vector to list if needed (handle numpy arrays)
+        if query_embedding is None:
+            candidate_ids.append(mem.id)
+        elif mem.embedding is not None:
+            # Convert pgvector value to list (numpy array or HalfVector)
             try:
-                if hasattr(mem.embedding, 'tolist'):
-                    embedding_list = mem.embedding.tolist()
-                elif hasattr(mem.embedding, '__iter__') and not isinstance(mem.embedding, str):
-                    embedding_list = list(mem.embedding)
-                else:
-                    embedding_list = mem.embedding
+                embedding_list = to_float_list(mem.embedding)
                 sim = cosine_similarity(query_embedding, embedding_list)
                 similarities.append(sim)
                 candidate_ids.append(mem.id)
@@ -291,15 +427,13 @@ async def hybrid_search(
         
         # Calculate similarity
         similarity = 0.0
-        if mem.embedding is not None:
-            # Convert pgvector Vector to list if needed (handle numpy arrays)
+        if (
+            mem.embedding is not None and query_embedding is not None
+            and mem.embedding_model == embedding_service.model_name
+        ):
+            # Convert pgvector value to list (numpy array or HalfVector)
             try:
-                if hasattr(mem.embedding, 'tolist'):
-                    embedding_list = mem.embedding.tolist()
-                elif hasattr(mem.embedding, '__iter__') and not isinstance(mem.embedding, str):
-                    embedding_list = list(mem.embedding)
-                else:
-                    embedding_list = mem.embedding
+                embedding_list = to_float_list(mem.embedding)
                 similarity = cosine_similarity(query_embedding, embedding_list)
             except Exception:
                 similarity = 0.0
@@ -352,7 +486,8 @@ async def hybrid_search(
                 "waypoint_weight": waypoint_weight,
                 "recency": recency,
                 "tag_match": tag_match,
-                "sector_weight": sector_weight
+                "sector_weight": sector_weight,
+                "keyword_only": query_embedding is None
             } if filters and filters.get("debug") else None
         })
     
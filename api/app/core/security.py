@@ -1,10 +1,13 @@
 """
 Security utilities for API key hashing and verification
 """
+import hashlib
 import secrets
 import bcrypt
 from typing import Tuple
 
+LEGACY_KEY_PREFIX = "um_live_"
+
 
 def generate_api_key(prefix: str = "um_live") -> Tuple[str, str]:
     """
@@ -30,6 +33,18 @@ def hash_api_key(key: str) -> str:
     return bcrypt.hashpw(key.encode(), bcrypt.gensalt()).decode()
 
 
+def digest_api_key(key: str) -> str:
+    """
+    SHA-256 digest of an API key.
+    
+    Stored in the indexed key_digest column so a presented key resolves to
+    its row with a single equality lookup. Keys carry 256 random bits, so
+    an unkeyed digest cannot be brute-forced, and no secret rotation can
+    invalidate it. The bcrypt hash is kept alongside.
+    """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
 def verify_api_key(plaintext_key: str, hashed_key: str) -> bool:
     """
     Verify a plaintext API key against its hash.
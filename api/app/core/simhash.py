@@ -1,8 +1,26 @@
 """
 SimHash for fuzzy text deduplication
+
+Hashes are 64-bit. The canonical in-memory and database form is a signed
+64-bit integer (Postgres BIGINT); the 16-char hex string matches the
+Swift implementation and is kept for compatibility.
 """
-import hashlib
-from typing import Set
+from typing import List, Set, Union
+
+import numpy as np
+from sqlalchemy import func, cast, Integer, literal_column
+from sqlalchemy.dialects.postgresql import BIT
+
+
+_MASK64 = (1 << 64) - 1
+
+# Multi-index hashing: with 4 bands of 16 bits, two hashes within Hamming
+# distance 3 agree exactly on at least one band (pigeonhole), so indexed
+# equality probes on the bands find every near duplicate
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = 16
+_BAND_MASK = (1 << SIMHASH_BAND_BITS) - 1
+_BIT_POSITIONS = np.arange(32, dtype=np.uint64)
 
 
 def canonical_token_set(text: str) -> Set[str]:
@@ -18,76 +36,121 @@ def canonical_token_set(text: str) -> Set[str]:
     return set(tokens)
 
 
-def compute_simhash(text: str) -> str:
+def _token_hashes(tokens: List[str]) -> np.ndarray:
     """
-    Compute SimHash for text (64-bit hex string)
-    Mirrors the Swift implementation
+    32-bit Java-style string hashes (h = 31*h + c, wrapping) for many tokens
+    
+    Equivalent to the Swift loop: the sum of c * 31^k over characters,
+    mod 2^32. Tokens are ASCII [a-z0-9] by construction.
     """
-    tokens = canonical_token_set(text)
-    hashes = []
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
     
-    for token in tokens:
-        h = 0
-        for char in token:
-            # Simulate 32-bit signed int operations
-            h = (h << 5) - h + ord(char)
-            h = h & 0xffffffff  # Enforce 32-bit semantics
-            
-            # Convert to signed 32-bit
-            if h & 0x80000000:
-                h = -((h ^ 0xffffffff) + 1)
-        
-        hashes.append(h & 0xffffffff)
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+    codes = np.frombuffer("".join(tokens).encode("ascii"), dtype=np.uint8).astype(np.uint64)
     
-    # Create 64-dim vector (by testing 32 bits twice)
-    vec = [0] * 64
-    for h in hashes:
-        for i in range(64):
-            bit = 1 << (i % 32)  # Wrap every 32 bits
-            if h & bit:
-                vec[i] += 1
-            else:
-                vec[i] -= 1
+    # Exponent of 31 for each character: distance from the end of its token
+    ends = np.cumsum(lengths)
+    exponents = np.repeat(ends, lengths) - 1 - np.arange(int(ends[-1]))
     
-    # Convert to hex string (16 hex digits = 64 bits)
-    res_hash = ""
-    for i in range(0, 64, 4):
-        nibble = 0
-        if vec[i] > 0:
-            nibble += 8
-        if vec[i+1] > 0:
-            nibble += 4
-        if vec[i+2] > 0:
-            nibble += 2
-        if vec[i+3] > 0:
-            nibble += 1
-        res_hash += format(nibble, 'x')
+    powers = np.empty(int(lengths.max()), dtype=np.uint64)
+    power = 1
+    for k in range(len(powers)):
+        powers[k] = power
+        power = (power * 31) & 0xffffffff
     
-    return res_hash
+    # Each term is < 2^39, so per-token sums cannot overflow 64 bits
+    terms = (codes * powers[exponents]) & np.uint64(0xffffffff)
+    starts = ends - lengths
+    return np.add.reduceat(terms, starts) & np.uint64(0xffffffff)
 
 
-def hamming_distance(h1: str, h2: str) -> int:
-    """Calculate Hamming distance between two SimHashes"""
-    if len(h1) != len(h2):
-        return 64  # Max distance
+def compute_simhashes(texts: List[str]) -> List[int]:
+    """
+    SimHash of many texts as signed 64-bit integers (vectorized)
     
-    dist = 0
-    for i in range(len(h1)):
-        x = int(h1[i], 16) ^ int(h2[i], 16)
-        # Count bits in nibble
-        if x & 8:
-            dist += 1
-        if x & 4:
-            dist += 1
-        if x & 2:
-            dist += 1
-        if x & 1:
-            dist += 1
+    Bit i of the 32-bit token hash votes for positions i and i + 32 of the
+    64-position vector (the Swift implementation tests 32 bits twice);
+    position 0 is the most significant bit.
+    """
+    token_lists = [list(canonical_token_set(text)) for text in texts]
+    counts = np.array([len(tokens) for tokens in token_lists], dtype=np.int64)
+    hashes = _token_hashes([token for tokens in token_lists for token in tokens])
+    
+    # Per-token bit matrix, then per-text count of set bits at each position
+    bits = ((hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)).astype(np.int64)
+    ones = np.zeros((len(texts), 32), dtype=np.int64)
+    has_tokens = counts > 0
+    if has_tokens.any():
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[has_tokens]
+        ones[has_tokens] = np.add.reduceat(bits, starts, axis=0)
     
-    return dist
+    # Position is set when more tokens have the bit than don't
+    half = (2 * ones > counts[:, None])
+    packed = np.packbits(np.hstack([half, half]), axis=1)
+    return [to_signed(int.from_bytes(row.tobytes(), "big")) for row in packed]
+
 
+def compute_simhash_int(text: str) -> int:
+    """SimHash of text as a signed 64-bit integer"""
+    return compute_simhashes([text])[0]
 
-def is_similar(h1: str, h2: str, threshold: int = 3) -> bool:
+
+def compute_simhash(text: str) -> str:
+    """
+    Compute SimHash for text (64-bit hex string)
+    Mirrors the Swift implementation
+    """
+    return simhash_to_hex(compute_simhash_int(text))
+
+
+def to_signed(value: int) -> int:
+    """Unsigned 64-bit value as the signed integer Postgres BIGINT stores"""
+    value &= _MASK64
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def simhash_to_int(h: str) -> int:
+    """Hex SimHash string to signed 64-bit integer"""
+    return to_signed(int(h, 16))
+
+
+def simhash_to_hex(h: int) -> str:
+    """Signed or unsigned 64-bit SimHash to the 16-char hex string"""
+    return format(h & _MASK64, "016x")
+
+
+def hamming_distance(h1: Union[int, str], h2: Union[int, str]) -> int:
+    """Calculate Hamming distance between two SimHashes (integers or hex strings)"""
+    if isinstance(h1, str):
+        if isinstance(h2, str) and len(h1) != len(h2):
+            return 64  # Max distance
+        h1 = int(h1, 16)
+    if isinstance(h2, str):
+        h2 = int(h2, 16)
+    return ((h1 ^ h2) & _MASK64).bit_count()
+
+
+def is_similar(h1: Union[int, str], h2: Union[int, str], threshold: int = 3) -> bool:
     """Check if two SimHashes are similar (within threshold)"""
     return hamming_distance(h1, h2) <= threshold
 
+
+def simhash_distance_sql(column, h):
+    """SQL expression: Hamming distance between a BIGINT SimHash column and h (XOR + bit_count, PG 14+)"""
+    return cast(func.bit_count(cast(column.op("#")(h), BIT(64))), Integer)
+
+
+def simhash_bands(h: int) -> List[int]:
+    """16-bit band values of a SimHash, lowest band first"""
+    return [(h >> (SIMHASH_BAND_BITS * k)) & _BAND_MASK for k in range(SIMHASH_BANDS)]
+
+
+def simhash_band_sql(column, band: int):
+    """
+    SQL expression for one band, matching the idx_memories_simhash_band* indexes
+
+    Constants are rendered inline so the planner can match the index expression.
+    """
+    shift = literal_column(str(SIMHASH_BAND_BITS * band))
+    return column.op(">>")(shift).op("&")(literal_column(str(_BAND_MASK)))
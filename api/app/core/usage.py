@@ -0,0 +1,111 @@
+"""
+Write-behind API key usage accounting
+"""
+from typing import Dict, Optional, Any
+from datetime import datetime, timezone
+import asyncio
+
+from sqlalchemy import text
+
+from app.db.database import AsyncSessionLocal
+from app.config import settings
+
+
+# One statement per flush, however many keys were used in the interval
+FLUSH_SQL = text("""
+    UPDATE api_keys AS k
+    SET usage_count = COALESCE(k.usage_count, 0) + u.count,
+        last_used_at = GREATEST(k.last_used_at, u.last_used_at)
+    FROM unnest(
+        CAST(:ids AS uuid[]),
+        CAST(:counts AS integer[]),
+        CAST(:last_used AS timestamptz[])
+    ) AS u(id, count, last_used_at)
+    WHERE k.id = u.id
+""")
+
+
+class UsageRecorder:
+    """Aggregate API key usage in memory and flush it periodically"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._pending: Dict[str, list] = {}  # key_id -> [count, last_used_at]
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.flush_failures = 0
+        self.flushed_uses = 0
+
+    def record(self, key_id: str, used_at: Optional[datetime] = None):
+        """Count one use of a key (no I/O)"""
+        used_at = used_at or datetime.now(timezone.utc)
+        entry = self._pending.get(key_id)
+        if entry is None:
+            self._pending[key_id] = [1, used_at]
+        else:
+            entry[0] += 1
+            entry[1] = max(entry[1], used_at)
+
+    async def flush(self):
+        """Write all pending counters in one bulk UPDATE"""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        params = {
+            "ids": list(pending.keys()),
+            "counts": [count for count, _ in pending.values()],
+            "last_used": [used_at for _, used_at in pending.values()],
+        }
+
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(FLUSH_SQL, params)
+                await session.commit()
+            self.flushes += 1
+            self.flushed_uses += sum(params["counts"])
+        except Exception as e:
+            # Put the counts back so the next flush retries them
+            self.flush_failures += 1
+            for key_id, (count, used_at) in pending.items():
+                entry = self._pending.get(key_id)
+                if entry is None:
+                    self._pending[key_id] = [count, used_at]
+                else:
+                    entry[0] += count
+                    entry[1] = max(entry[1], used_at)
+            print(f"[Usage] Failed to flush API key usage: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring"""
+        return {
+            "pending_keys": len(self._pending),
+            "pending_uses": sum(count for count, _ in self._pending.values()),
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "flushed_uses": self.flushed_uses,
+        }
+
+
+usage_recorder = UsageRecorder(interval_seconds=settings.API_KEY_USAGE_FLUSH_SECONDS)
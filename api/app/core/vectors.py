@@ -0,0 +1,130 @@
+"""
+Embedding storage types and vector encoding helpers
+"""
+from typing import Any, List, Tuple
+import numpy as np
+from pgvector.sqlalchemy import Vector, HALFVEC
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+
+
+# Column type and matching cosine operator class per EMBEDDING_STORAGE mode
+STORAGE_TYPES = {
+    "vector": (Vector, "vector", "vector_cosine_ops", 4),    # float32
+    "halfvec": (HALFVEC, "halfvec", "halfvec_cosine_ops", 2),  # float16
+}
+
+
+def _storage(mode: str) -> tuple:
+    try:
+        return STORAGE_TYPES[mode]
+    except KeyError:
+        raise ValueError(f"Unknown EMBEDDING_STORAGE '{mode}' (expected one of: {', '.join(STORAGE_TYPES)})")
+
+
+def embedding_column_type(dim: int, mode: str = None) -> Any:
+    """SQLAlchemy type for Memory.embedding under the given storage mode"""
+    return _storage(mode or settings.EMBEDDING_STORAGE)[0](dim)
+
+
+def embedding_sql_type(mode: str = None) -> str:
+    """Postgres type name for a storage mode"""
+    return _storage(mode or settings.EMBEDDING_STORAGE)[1]
+
+
+def embedding_cosine_ops(mode: str = None) -> str:
+    """Operator class for a cosine ANN index under a storage mode"""
+    return _storage(mode or settings.EMBEDDING_STORAGE)[2]
+
+
+def bytes_per_dim(mode: str = None) -> int:
+    """Storage bytes per dimension (excluding the small per-value header)"""
+    return _storage(mode or settings.EMBEDDING_STORAGE)[3]
+
+
+def to_float_list(value: Any) -> List[float]:
+    """Convert a stored embedding (numpy array, HalfVector, list) to a list"""
+    if value is None:
+        return []
+    if hasattr(value, "to_list"):
+        return value.to_list()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return list(value)
+
+
+def truncate_normalize(vector: Any, dim: int) -> List[float]:
+    """First dim components re-normalized to unit length (Matryoshka prefix)"""
+    prefix = np.asarray(to_float_list(vector)[:dim], dtype=np.float32)
+    norm = np.linalg.norm(prefix)
+    if norm > 0:
+        prefix /= norm
+    return prefix.tolist()
+
+
+# Set bits per byte value, for popcount over packed codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+
+def binary_code(vector: Any) -> bytes:
+    """Sign-bit code of a vector, packed 8 dims per byte (bit(dim) on the wire)"""
+    return np.packbits(np.asarray(to_float_list(vector), dtype=np.float32) > 0).tobytes()
+
+
+def code_bytes(value: Any) -> bytes:
+    """Packed bytes of a stored bit value (asyncpg BitString or bytes)"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    return value.bytes
+
+
+def hamming_distances(query_code: bytes, codes: List[bytes]) -> np.ndarray:
+    """Hamming distance from query_code to each code via XOR + popcount"""
+    if not codes:
+        return np.zeros(0, dtype=np.uint32)
+    q = np.frombuffer(query_code, dtype=np.uint8)
+    m = np.frombuffer(b"".join(codes), dtype=np.uint8).reshape(len(codes), -1)
+    return _POPCOUNT[np.bitwise_xor(m, q)].sum(axis=1, dtype=np.uint32)
+
+
+def quantize_int8(vector: Any) -> Tuple[np.ndarray, float]:
+    """Symmetric scalar quantization to int8; returns (codes, scale)"""
+    v = np.asarray(vector, dtype=np.float32)
+    scale = float(np.abs(v).max()) / 127.0 if v.size else 0.0
+    if scale == 0.0:
+        return np.zeros(v.shape, dtype=np.int8), 0.0
+    return np.clip(np.rint(v / scale), -127, 127).astype(np.int8), scale
+
+
+def dequantize_int8(codes: np.ndarray, scale: float) -> np.ndarray:
+    """Inverse of quantize_int8"""
+    return codes.astype(np.float32) * scale
+
+
+async def tune_scoped_ann(session: AsyncSession, pool_size: int = 0):
+    """
+    Set ivfflat and hnsw scan parameters for the current transaction
+    
+    Owner/user filters are applied after the index scan, so with one probe
+    (or a small hnsw candidate list) a tenant's nearest rows can be missing
+    from the scan and LIMIT comes back short. Call before each scoped
+    ORDER BY embedding <=> query; pool_size is the LIMIT of that query, so
+    hnsw.ef_search is raised to cover it.
+    """
+    params = {
+        "probes": str(settings.IVFFLAT_PROBES),
+        "ef_search": str(min(1000, max(settings.HNSW_EF_SEARCH, pool_size))),
+    }
+    columns = [
+        "set_config('ivfflat.probes', :probes, true)",
+        "set_config('hnsw.ef_search', :ef_search, true)",
+    ]
+    if settings.IVFFLAT_ITERATIVE_SCAN != "off":
+        params["scan"] = settings.IVFFLAT_ITERATIVE_SCAN
+        columns.append("set_config('ivfflat.iterative_scan', :scan, true)")
+    if settings.HNSW_ITERATIVE_SCAN != "off":
+        params["hnsw_scan"] = settings.HNSW_ITERATIVE_SCAN
+        columns.append("set_config('hnsw.iterative_scan', :hnsw_scan, true)")
+    await session.execute(text(f"SELECT {', '.join(columns)}"), params)
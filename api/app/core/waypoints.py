@@ -2,135 +2,138 @@
 Waypoint creation and management
 """
 from typing import List, Tuple, Optional, Dict
+from collections import defaultdict
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 import numpy as np
 import uuid
-from datetime import datetime
 
 from app.db.models import Memory, Waypoint
+from app.core.embeddings import get_embedding_service
+from app.core.vectors import tune_scoped_ann
+from app.config import settings
 
 
 MIN_SIMILARITY_THRESHOLD = 0.5  # Minimum similarity to create waypoint
 
 
+async def _nearest_existing(
+    session: AsyncSession,
+    owner_id: Optional[str],
+    user_id: str,
+    embedding: List[float],
+    exclude_ids: List[str],
+    k: int
+) -> List[Tuple[str, float]]:
+    """
+    Top-k stored memories of a user by cosine similarity, as (id, similarity)
+    
+    Served by the embedding ANN index (run tune_scoped_ann first so the
+    owner/user filter doesn't starve it); only ids and distances are fetched.
+    Memories embedded by another model are in a different vector space and skipped.
+    """
+    distance = Memory.embedding.cosine_distance(embedding)
+    stmt = select(Memory.id, distance.label("distance")).where(
+        and_(
+            Memory.id.notin_(exclude_ids),
+            Memory.embedding.isnot(None),
+            Memory.embedding_model == get_embedding_service().model_name,
+            Memory.is_active == True,
+            Memory.owner_id == owner_id,
+            Memory.user_id == user_id
+        )
+    ).order_by(distance).limit(k)
+    rows = (await session.execute(stmt)).all()
+    return [(str(row.id), 1.0 - float(row.distance)) for row in rows]
+
+
 async def create_waypoint_for_memory(
     session: AsyncSession,
+    owner_id: Optional[str],
     new_memory_id: str,
     new_embedding: List[float],
     user_id: str,
-    limit: int = 1000
-) -> Optional[Waypoint]:
+    k: Optional[int] = None
+) -> List[Waypoint]:
+    """
+    Find the most similar existing memories and create waypoint links
+    
+    Mirrors the Mac app's createWaypointForNewMemory logic (with k=1)
+    """
+    waypoints = await create_waypoints_for_memories(
+        session, owner_id, [(new_memory_id, new_embedding, user_id)], k=k
+    )
+    await session.flush()
+    return waypoints
+
+
+def _unit_rows(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+async def create_waypoints_for_memories(
+    session: AsyncSession,
+    owner_id: Optional[str],
+    new_memories: List[Tuple[str, List[float], str]],
+    k: Optional[int] = None
+) -> List[Waypoint]:
     """
-    Find most similar existing memory and create a waypoint link
+    Create waypoints for memories inserted together
     
-    Mirrors the Mac app's createWaypointForNewMemory logic
+    new_memories holds (memory_id, embedding, user_id) in insertion order.
+    Each memory links to its k (WAYPOINT_TOP_K) most similar memories above
+    MIN_SIMILARITY_THRESHOLD, taken from one ANN top-k query over the
+    user's stored memories plus the batch memories before it, as if they
+    had been added one by one. Without a match it gets a self-link.
+    Waypoints are added to the session; the caller flushes.
     """
+    k = k or settings.WAYPOINT_TOP_K
+    waypoints = []
+    new_ids = [memory_id for memory_id, _, _ in new_memories]
+    by_user: Dict[str, List[Tuple[str, List[float]]]] = defaultdict(list)
+    for memory_id, embedding, user_id in new_memories:
+        by_user[user_id].append((memory_id, embedding))
+    
     try:
-        # Get existing memories with embeddings (exclude the new one)
-        stmt = select(Memory).where(
-            and_(
-                Memory.id != new_memory_id,
-                Memory.embedding.isnot(None),
-                Memory.is_active == True,
-                Memory.user_id == user_id
-            )
-        ).order_by(Memory.salience.desc()).limit(limit)
-        
-        result = await session.execute(stmt)
-        existing_memories = result.scalars().all()
-        
-        if not existing_memories:
-            # No existing memories, create self-link
-            waypoint = Waypoint(
-                id=str(uuid.uuid4()),
-                src_id=new_memory_id,
-                dst_id=new_memory_id,
-                weight=1.0
-            )
-            session.add(waypoint)
-            await session.flush()
-            return waypoint
-        
-        # Helper function for cosine similarity
-        def cosine_similarity(a: List[float], b: List[float]) -> float:
-            """Calculate cosine similarity between two vectors"""
-            if not a or not b or len(a) != len(b):
-                return 0.0
-            dot = sum(x * y for x, y in zip(a, b))
-            norm_a = (sum(x * x for x in a)) ** 0.5
-            norm_b = (sum(x * x for x in b)) ** 0.5
-            if norm_a == 0 or norm_b == 0:
-                return 0.0
-            return dot / (norm_a * norm_b)
-        
-        # Find best match by cosine similarity
-        best_target_id = None
-        best_similarity = -1.0
-        
-        for mem in existing_memories:
-            if mem.embedding is None or mem.id == new_memory_id:
-                continue
-            
-            # Convert embedding to list (handle numpy arrays from pgvector)
-            try:
-                if hasattr(mem.embedding, 'tolist'):
-                    mem_embedding = mem.embedding.tolist()
-                else:
-                    mem_embedding = list(mem.embedding)
-            except Exception:
-                continue
-            
-            # Calculate cosine similarity
-            similarity = cosine_similarity(new_embedding, mem_embedding)
+        # One probe setting for all the scoped top-k queries below
+        await tune_scoped_ann(session)
+        for user_id, items in by_user.items():
+            # Earlier batch members only (strict lower triangle)
+            new_matrix = _unit_rows([embedding for _, embedding in items])
+            batch_sims = new_matrix @ new_matrix.T
+            batch_sims[np.triu_indices(len(items))] = -np.inf
             
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_target_id = str(mem.id)
-        
-        # Create waypoint if similarity is above threshold
-        if best_target_id and best_similarity >= MIN_SIMILARITY_THRESHOLD:
-            # Check if waypoint already exists
-            existing_stmt = select(Waypoint).where(
-                and_(
-                    Waypoint.src_id == new_memory_id,
-                    Waypoint.dst_id == best_target_id
+            for i, (memory_id, embedding) in enumerate(items):
+                matches = await _nearest_existing(
+                    session, owner_id, user_id, embedding, new_ids, k
                 )
-            )
-            existing_result = await session.execute(existing_stmt)
-            existing_waypoint = existing_result.scalar_one_or_none()
-            
-            if existing_waypoint:
-                # Update weight
-                existing_waypoint.weight = float(best_similarity)
-                existing_waypoint.updated_at = datetime.utcnow()
-                await session.flush()
-                return existing_waypoint
-            else:
-                # Create new waypoint
-                waypoint = Waypoint(
-                    id=str(uuid.uuid4()),
-                    src_id=new_memory_id,
-                    dst_id=best_target_id,
-                    weight=float(best_similarity)
+                matches.extend(
+                    (items[j][0], float(batch_sims[i, j])) for j in range(i)
                 )
-                session.add(waypoint)
-                await session.flush()
-                print(f"[Waypoint] Created: {new_memory_id} → {best_target_id} (sim: {best_similarity:.2f})")
-                return waypoint
-        else:
-            # No good match, create self-link (OpenMemory style)
-            waypoint = Waypoint(
-                id=str(uuid.uuid4()),
-                src_id=new_memory_id,
-                dst_id=new_memory_id,
-                weight=1.0
-            )
-            session.add(waypoint)
-            await session.flush()
-            return waypoint
-            
+                matches = sorted(
+                    (m for m in matches if m[1] >= MIN_SIMILARITY_THRESHOLD),
+                    key=lambda m: m[1],
+                    reverse=True
+                )[:k]
+                if not matches:
+                    matches = [(memory_id, 1.0)]  # Self-link (OpenMemory style)
+                
+                waypoints.extend(
+                    Waypoint(
+                        id=str(uuid.uuid4()),
+                        src_id=memory_id,
+                        dst_id=dst_id,
+                        weight=weight
+                    )
+                    for dst_id, weight in matches
+                )
+        
+        session.add_all(waypoints)
+        return waypoints
+        
     except Exception as e:
-        print(f"[Waypoint] Failed to create waypoint: {e}")
-        return None
-
+        print(f"[Waypoint] Failed to create batch waypoints: {e}")
+        return []
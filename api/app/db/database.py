@@ -42,12 +42,15 @@ async def init_db():
     """Initialize database (create tables, enable pgvector)"""
     # Import models to register them with Base
     from app.db import models  # noqa: F401
+    from app.db.migrations import run_migrations
     
     async with engine.begin() as conn:
         # Enable pgvector extension
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         # Create all tables
         await conn.run_sync(Base.metadata.create_all)
+        # Add columns/indexes that create_all can't add to existing tables
+        await run_migrations(conn)
     print("✅ Database initialized")
 
 
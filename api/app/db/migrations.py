@@ -0,0 +1,67 @@
+"""
+Idempotent schema migrations applied at startup
+
+create_all() only creates missing tables, so columns and indexes added to
+existing tables are listed here with IF NOT EXISTS guards.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.config import settings
+
+
+def optional_index(enabled: bool, name: str, definition: str) -> str:
+    """
+    Index for an opt-in search path: created while the feature is on and
+    dropped while it is off, so inserts don't maintain an unused ANN index
+    """
+    if enabled:
+        return f"CREATE INDEX IF NOT EXISTS {name} ON memories {definition}"
+    return f"DROP INDEX IF EXISTS {name}"
+
+
+EMBEDDING_PREFIX_INDEX = ("idx_memories_embedding_prefix", "USING hnsw (embedding_prefix vector_cosine_ops)")
+# bit_hamming_ops needs pgvector 0.7+
+EMBEDDING_BITS_INDEX = ("idx_memories_embedding_bits", "USING hnsw (embedding_bits bit_hamming_ops)")
+
+
+MIGRATIONS = [
+    # API key digest lookup (legacy keys are backfilled on first use)
+    "ALTER TABLE api_keys ADD COLUMN IF NOT EXISTS key_digest VARCHAR(64)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_api_keys_key_digest ON api_keys (key_digest)",
+    # Matryoshka prefix embeddings, written and indexed only with TWO_STAGE_SEARCH
+    # (backfill: python -m scripts.embedding_prefix backfill)
+    f"ALTER TABLE memories ADD COLUMN IF NOT EXISTS embedding_prefix vector({settings.EMBEDDING_PREFIX_DIM})",
+    optional_index(settings.TWO_STAGE_SEARCH, *EMBEDDING_PREFIX_INDEX),
+    # Binary codes for Hamming pre-filtering, written only with BINARY_PREFILTER and
+    # indexed only in "sql" mode (backfill: python -m scripts.embedding_bits backfill)
+    f"ALTER TABLE memories ADD COLUMN IF NOT EXISTS embedding_bits bit({settings.EMBEDDING_DIM})",
+    optional_index(settings.BINARY_PREFILTER == "sql", *EMBEDDING_BITS_INDEX),
+    # Integer SimHash (backfill: python -m scripts.simhash backfill)
+    "ALTER TABLE memories ADD COLUMN IF NOT EXISTS simhash_int BIGINT",
+    # Upsert key for race-free inserts of new memories
+    "ALTER TABLE memories ADD COLUMN IF NOT EXISTS fingerprint BIGINT",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_memories_fingerprint ON memories "
+    "(owner_id, user_id, fingerprint) WHERE is_active = true",
+    # SimHash band indexes for near-duplicate probes (multi-index hashing)
+    *[
+        f"CREATE INDEX IF NOT EXISTS idx_memories_simhash_band{band} ON memories "
+        f"(owner_id, user_id, ((simhash_int >> {16 * band}) & 65535))"
+        for band in range(4)
+    ],
+    # Raw-input memoization (older rows hold SimHashes and never match)
+    "ALTER TABLE processing_logs ADD COLUMN IF NOT EXISTS owner_id UUID REFERENCES users(id) ON DELETE CASCADE",
+    "ALTER TABLE processing_logs ADD COLUMN IF NOT EXISTS user_id VARCHAR(100)",
+    "ALTER TABLE processing_logs ADD COLUMN IF NOT EXISTS memory_ids JSONB DEFAULT '[]'::jsonb",
+    "CREATE INDEX IF NOT EXISTS idx_processing_logs_memo ON processing_logs "
+    "(owner_id, user_id, raw_content_hash, processed_at)",
+    # Embedding cache expiry (existing rows start their clock now)
+    "ALTER TABLE embedding_cache ADD COLUMN IF NOT EXISTS last_used_at TIMESTAMPTZ NOT NULL DEFAULT now()",
+    "CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache (last_used_at)",
+]
+
+
+async def run_migrations(conn: AsyncConnection):
+    """Apply all migrations in order"""
+    for statement in MIGRATIONS:
+        await conn.execute(text(statement))
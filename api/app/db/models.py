@@ -1,15 +1,17 @@
 """
 Database models for UniMemory API
 """
-from sqlalchemy import Column, String, Text, Float, Integer, Boolean, DateTime, ForeignKey, Index, JSON
+from sqlalchemy import Column, String, Text, Float, Integer, BigInteger, Boolean, DateTime, ForeignKey, Index, JSON, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-from pgvector.sqlalchemy import Vector
+from sqlalchemy.sql import func, text
+from pgvector.sqlalchemy import Vector, BIT
 from datetime import datetime
 import uuid
 
 from app.db.database import Base
+from app.config import settings
+from app.core.vectors import embedding_column_type, embedding_cosine_ops
 
 
 class Memory(Base):
@@ -25,7 +27,9 @@ class Memory(Base):
     content = Column(Text, nullable=False)
     
     # OpenMemory fields
-    simhash = Column(String(16), index=True)  # SimHash for deduplication
+    simhash = Column(String(16), index=True)  # SimHash for deduplication (hex, Swift-compatible)
+    simhash_int = Column(BigInteger)  # Same SimHash as a signed 64-bit integer (XOR/popcount distance)
+    fingerprint = Column(BigInteger)  # simhash_int, unique per owner/user among active memories (upsert key)
     sector = Column(String(20), index=True)   # semantic, episodic, procedural, emotional, reflective
     salience = Column(Float, default=0.5, index=True)  # Importance score (0.0 - 1.0)
     decay_lambda = Column(Float, default=0.02)  # Decay rate
@@ -41,7 +45,9 @@ class Memory(Base):
     owner_id = Column(UUID(as_uuid=False), ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)  # UniMemory user who owns this memory
     
     # Embeddings (pgvector)
-    embedding = Column(Vector(1536))  # text-embedding-3-small = 1536 dims
+    embedding = Column(embedding_column_type(settings.EMBEDDING_DIM))  # text-embedding-3-small = 1536 dims
+    embedding_prefix = Column(Vector(settings.EMBEDDING_PREFIX_DIM))  # Normalized leading dims for two-stage search
+    embedding_bits = Column(BIT(settings.EMBEDDING_DIM))  # Sign-bit code for Hamming pre-filtering
     embedding_model = Column(String(50))
     
     # Status
@@ -59,7 +65,25 @@ class Memory(Base):
         Index("idx_memories_user_id", "user_id"),
         Index("idx_memories_owner_id", "owner_id"),
         Index("idx_memories_created_at", "created_at", postgresql_ops={"created_at": "DESC"}),
-        Index("idx_memories_embedding", "embedding", postgresql_using="ivfflat", postgresql_with={"lists": 100}),
+        Index(
+            "idx_memories_embedding", "embedding",
+            postgresql_using="ivfflat",
+            postgresql_with={"lists": 100},
+            postgresql_ops={"embedding": embedding_cosine_ops()}
+        ),
+        Index(
+            "idx_memories_fingerprint", "owner_id", "user_id", "fingerprint",
+            unique=True,
+            postgresql_where=text("is_active = true")
+        ),
+        # SimHash bands for near-duplicate probes (see app.core.simhash)
+        *[
+            Index(
+                f"idx_memories_simhash_band{band}", "owner_id", "user_id",
+                text(f"((simhash_int >> {16 * band}) & 65535)")
+            )
+            for band in range(4)
+        ],
     )
     
     def __repr__(self):
@@ -130,6 +154,7 @@ class APIKey(Base):
     id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String(100), nullable=False)
     key_hash = Column(String(255), nullable=False)  # Hashed API key
+    key_digest = Column(String(64))  # SHA-256 of the key for indexed lookup (NULL for unmigrated legacy keys)
     key_prefix = Column(String(20))  # First few chars for identification
     
     # User association
@@ -149,6 +174,11 @@ class APIKey(Base):
     # Relationships
     user = relationship("User", back_populates="api_keys")
     
+    # Indexes
+    __table_args__ = (
+        Index("idx_api_keys_key_digest", "key_digest", unique=True),
+    )
+    
     def __repr__(self):
         return f"<APIKey(id={self.id}, name={self.name})>"
 
@@ -158,12 +188,67 @@ class ProcessingLog(Base):
     __tablename__ = "processing_logs"
     
     id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
-    raw_content_hash = Column(String(64), index=True)  # Hash of raw input
+    raw_content_hash = Column(String(64), index=True)  # SHA-256 of raw input
+    owner_id = Column(UUID(as_uuid=False), ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    user_id = Column(String(100))
     processed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     was_worth_remembering = Column(Boolean, nullable=False)
     reason = Column(Text)
     extracted_count = Column(Integer, default=0)
+    memory_ids = Column(JSONB, default=list)  # Memories the input produced or matched
+    
+    __table_args__ = (
+        Index("idx_processing_logs_memo", "owner_id", "user_id", "raw_content_hash", "processed_at"),
+    )
     
     def __repr__(self):
         return f"<ProcessingLog(id={self.id}, worth={self.was_worth_remembering})>"
 
+
+
+class EmbeddingCacheEntry(Base):
+    """Persistent embedding cache keyed by model and normalized text hash"""
+    __tablename__ = "embedding_cache"
+    
+    model = Column(String(100), primary_key=True)
+    text_hash = Column(String(64), primary_key=True)  # SHA-256 of normalized text
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # Packed little-endian float32
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Expiry clock
+    
+    __table_args__ = (
+        Index("idx_embedding_cache_last_used", "last_used_at"),
+    )
+    
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry(model={self.model}, hash={self.text_hash[:12]})>"
+
+
+class IngestionJob(Base):
+    """Queued /memories/add request processed by background workers"""
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
+    owner_id = Column(UUID(as_uuid=False), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    # Status: queued, running, completed, failed
+    status = Column(String(20), nullable=False, default="queued")
+    payload = Column(JSONB, nullable=False)  # content, source_app, user_id, metadata
+    progress = Column(JSONB, default=dict)  # Current stage and counters
+    result = Column(JSONB)  # Same shape as the synchronous /memories/add response
+    error = Column(Text)
+    attempts = Column(Integer, default=0, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True))  # Also the lease start for the running worker
+    finished_at = Column(DateTime(timezone=True))
+    
+    # Indexes
+    __table_args__ = (
+        Index("idx_ingestion_jobs_status_created", "status", "created_at"),
+    )
+    
+    def __repr__(self):
+        return f"<IngestionJob(id={self.id}, status={self.status})>"
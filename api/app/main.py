@@ -1,14 +1,22 @@
 """
 UniMemory API - Main FastAPI application
 """
-from fastapi import FastAPI, Depends, HTTPException, Header
+from fastapi import FastAPI, Depends, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
+import math
 
 from app.config import settings
 from app.db.database import init_db, close_db, get_db
-from app.api import memories, search, health, auth, keys
+from app.api import memories, search, health, auth, keys, jobs
+from app.core.usage import usage_recorder
+from app.core.offload import auth_pool
+from app.core.embeddings import close_embedding_service
+from app.core.extractor import close_extractor
+from app.core.admission import Overloaded
+from app.core.jobs import ingestion_workers
 
 
 @asynccontextmanager
@@ -21,12 +29,19 @@ async def lifespan(app: FastAPI):
         print("✅ Database initialized")
     except Exception as e:
         print(f"⚠️ Database init warning: {e}")
+    usage_recorder.start()
+    ingestion_workers.start()
     
     yield
     
     # Shutdown
     print("🛑 Shutting down UniMemory API...")
+    await ingestion_workers.stop()
+    await usage_recorder.stop()  # Flush pending API key usage before the pool closes
+    await close_embedding_service()
+    await close_extractor()
     await close_db()
+    auth_pool.shutdown()
 
 
 # Create FastAPI app
@@ -46,12 +61,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Shed load quickly instead of queueing behind a saturated provider"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
+
 # Include routers
 app.include_router(health.router, prefix=settings.API_PREFIX, tags=["health"])
 app.include_router(auth.router, prefix=settings.API_PREFIX, tags=["auth"])
 app.include_router(keys.router, prefix=settings.API_PREFIX, tags=["api-keys"])
 app.include_router(memories.router, prefix=settings.API_PREFIX, tags=["memories"])
 app.include_router(search.router, prefix=settings.API_PREFIX, tags=["search"])
+app.include_router(jobs.router, prefix=settings.API_PREFIX, tags=["jobs"])
 
 
 @app.get("/")
@@ -0,0 +1,64 @@
+"""
+Backfill sign-bit embedding codes used by the binary pre-filter
+
+Run from the api/ directory:
+
+    python -m scripts.embedding_bits backfill [--batch 5000] [--index]
+
+Fills memories.embedding_bits for existing rows in SQL with pgvector's
+binary_quantize() (0.7+), which sets a bit for every positive component
+exactly like app.core.vectors.binary_code does at write time. Codes are
+only written at insert time while BINARY_PREFILTER is on, so run it right
+after enabling the setting. --index also builds the HNSW bit_hamming_ops
+index used by BINARY_PREFILTER=sql.
+"""
+import argparse
+import asyncio
+from sqlalchemy import text
+
+from app.db.database import AsyncSessionLocal, engine
+from app.db.migrations import optional_index, EMBEDDING_BITS_INDEX
+from app.config import settings
+
+
+async def backfill(batch: int, index: bool):
+    dim = settings.EMBEDDING_DIM
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(text(f"""
+                UPDATE memories
+                SET embedding_bits = binary_quantize(embedding)::bit({dim})
+                WHERE id IN (
+                    SELECT id FROM memories
+                    WHERE embedding IS NOT NULL AND embedding_bits IS NULL
+                    LIMIT :batch
+                )
+            """), {"batch": batch})
+            await session.commit()
+        if result.rowcount == 0:
+            break
+        total += result.rowcount
+        print(f"backfilled {total} rows")
+    print(f"Done: {total} rows now have a binary code")
+
+    if index:
+        async with engine.begin() as conn:
+            await conn.execute(text(optional_index(True, *EMBEDDING_BITS_INDEX)))
+        print(f"Index {EMBEDDING_BITS_INDEX[0]} is in place")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = sub.add_parser("backfill", help="fill embedding_bits for existing rows")
+    backfill_parser.add_argument("--batch", type=int, default=5000)
+    backfill_parser.add_argument("--index", action="store_true", help="also build the Hamming HNSW index")
+
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch, args.index))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Matryoshka prefix embeddings: backfill and two-stage search benchmark
+
+Run from the api/ directory:
+
+    python -m scripts.embedding_prefix backfill [--batch 5000]
+    python -m scripts.embedding_prefix benchmark [--queries 100] [--k 10]
+
+`backfill` fills memories.embedding_prefix for existing rows in SQL
+(l2_normalize(subvector(...)), pgvector 0.7+), in batches so it can run
+against a live table, then builds the prefix HNSW index. Prefixes are only
+written at insert time while TWO_STAGE_SEARCH is on, so run it right after
+enabling the setting.
+
+`benchmark` takes stored embeddings as queries and compares single-stage
+ANN search against prefix-first two-stage search: p50/p95 latency and
+recall@k, both measured against an exact sequential-scan ranking.
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from sqlalchemy import select, text
+
+from app.db.database import AsyncSessionLocal, engine
+from app.db.models import Memory
+from app.db.migrations import optional_index, EMBEDDING_PREFIX_INDEX
+from app.core.search import two_stage_vector_query
+from app.core.vectors import to_float_list
+from app.config import settings
+
+
+async def backfill(batch: int):
+    dim = settings.EMBEDDING_PREFIX_DIM
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(text(f"""
+                UPDATE memories
+                SET embedding_prefix = l2_normalize(subvector(embedding::vector, 1, {dim}))
+                WHERE id IN (
+                    SELECT id FROM memories
+                    WHERE embedding IS NOT NULL AND embedding_prefix IS NULL
+                    LIMIT :batch
+                )
+            """), {"batch": batch})
+            await session.commit()
+        if result.rowcount == 0:
+            break
+        total += result.rowcount
+        print(f"backfilled {total} rows")
+    print(f"Done: {total} rows now have a {dim}-dim prefix embedding")
+
+    async with engine.begin() as conn:
+        await conn.execute(text(optional_index(True, *EMBEDDING_PREFIX_INDEX)))
+    print(f"Index {EMBEDDING_PREFIX_INDEX[0]} is in place")
+
+
+async def timed_ids(session, stmt) -> tuple[list, float]:
+    start = time.perf_counter()
+    ids = (await session.execute(stmt)).scalars().all()
+    return ids, time.perf_counter() - start
+
+
+def summarize(name: str, latencies: list, recalls: list):
+    p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+    print(f"{name:<14}{p50:>10.2f}{p95:>10.2f}{np.mean(recalls):>10.4f}")
+
+
+async def benchmark(queries: int, k: int):
+    async with AsyncSessionLocal() as session:
+        stmt = select(Memory.embedding).where(
+            Memory.embedding.isnot(None)
+        ).order_by(Memory.id).limit(queries)
+        query_vectors = [to_float_list(v) for v in (await session.execute(stmt)).scalars().all()]
+
+    if not query_vectors:
+        print("No embeddings to benchmark")
+        return
+
+    conditions = [Memory.embedding.isnot(None), Memory.is_active == True]
+    single = {"latency": [], "recall": []}
+    two_stage = {"latency": [], "recall": []}
+
+    async with AsyncSessionLocal() as session:
+        for q in query_vectors:
+            # Exact ground truth: force a sequential scan
+            async with session.begin():
+                await session.execute(text("SET LOCAL enable_indexscan = off"))
+                await session.execute(text("SET LOCAL enable_bitmapscan = off"))
+                exact_stmt = select(Memory.id).where(*conditions).order_by(
+                    Memory.embedding.cosine_distance(q)
+                ).limit(k)
+                truth = set((await session.execute(exact_stmt)).scalars().all())
+
+            single_stmt = select(Memory.id).where(*conditions).order_by(
+                Memory.embedding.cosine_distance(q)
+            ).limit(k)
+            ids, elapsed = await timed_ids(session, single_stmt)
+            single["latency"].append(elapsed)
+            single["recall"].append(len(truth & set(ids)) / max(1, len(truth)))
+
+            two_stmt = two_stage_vector_query(conditions, q, k).with_only_columns(Memory.id)
+            ids, elapsed = await timed_ids(session, two_stmt)
+            two_stage["latency"].append(elapsed)
+            two_stage["recall"].append(len(truth & set(ids)) / max(1, len(truth)))
+            await session.rollback()
+
+    print(f"{len(query_vectors)} queries, recall@{k}, prefix dim {settings.EMBEDDING_PREFIX_DIM}, "
+          f"{settings.TWO_STAGE_CANDIDATES} candidates")
+    print(f"{'path':<14}{'p50 ms':>10}{'p95 ms':>10}{'recall':>10}")
+    summarize("single-stage", single["latency"], single["recall"])
+    summarize("two-stage", two_stage["latency"], two_stage["recall"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = sub.add_parser("backfill", help="fill embedding_prefix for existing rows")
+    backfill_parser.add_argument("--batch", type=int, default=5000)
+
+    bench_parser = sub.add_parser("benchmark", help="single-stage vs two-stage latency and recall")
+    bench_parser.add_argument("--queries", type=int, default=100)
+    bench_parser.add_argument("--k", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "backfill":
+        asyncio.run(backfill(args.batch))
+    else:
+        asyncio.run(benchmark(args.queries, args.k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Embedding storage migration and recall-vs-size report
+
+Run from the api/ directory:
+
+    python -m scripts.embedding_storage report [--sample 2000] [--k 10]
+    python -m scripts.embedding_storage migrate --to halfvec
+    python -m scripts.embedding_storage reindex [--lists N]
+
+`report` samples stored embeddings, uses some of them as queries and
+measures recall@k of float16 and int8 copies against exact float32
+ranking, next to bytes per vector and current table/index sizes.
+
+`migrate` rewrites memories.embedding in place to the target type
+(converting every existing row) and rebuilds the cosine ANN index with
+the matching operator class. Set EMBEDDING_STORAGE to the same mode
+before restarting the API.
+
+`reindex` rebuilds the ivfflat index from the rows now in the table.
+ivfflat picks its list centroids when the index is built, and startup
+builds it on an empty table, so rebuild it once data is loaded (and after
+large growth). --lists defaults to rows / 1000 (sqrt(rows) above 1M rows).
+"""
+import argparse
+import asyncio
+import numpy as np
+from sqlalchemy import select, text
+
+from app.db.database import AsyncSessionLocal, engine
+from app.db.models import Memory
+from app.core.vectors import (
+    STORAGE_TYPES, embedding_sql_type, embedding_cosine_ops,
+    to_float_list, quantize_int8, dequantize_int8
+)
+from app.config import settings
+
+
+def recall_at_k(exact: np.ndarray, approx: np.ndarray, queries: np.ndarray, k: int) -> float:
+    """Mean overlap of approx top-k with exact top-k for each query"""
+    exact_scores = queries @ exact.T
+    approx_scores = queries @ approx.T
+    hits = 0
+    for i in range(len(queries)):
+        truth = set(np.argpartition(-exact_scores[i], k)[:k])
+        found = set(np.argpartition(-approx_scores[i], k)[:k])
+        hits += len(truth & found)
+    return hits / (len(queries) * k)
+
+
+def normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+async def relation_sizes() -> dict:
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(text("""
+            SELECT pg_total_relation_size('memories') AS table_bytes,
+                   COALESCE(pg_relation_size(to_regclass('idx_memories_embedding')), 0) AS index_bytes
+        """))
+        row = result.one()
+    return {"table_bytes": row.table_bytes, "index_bytes": row.index_bytes}
+
+
+async def report(sample: int, k: int, queries: int):
+    async with AsyncSessionLocal() as session:
+        stmt = select(Memory.embedding).where(
+            Memory.embedding.isnot(None),
+            Memory.is_active == True
+        ).limit(sample)
+        rows = (await session.execute(stmt)).scalars().all()
+
+    if len(rows) <= k:
+        print(f"Need more than {k} embeddings, found {len(rows)}")
+        return
+
+    exact = normalize(np.array([to_float_list(v) for v in rows], dtype=np.float32))
+    dim = exact.shape[1]
+    rng = np.random.default_rng(0)
+    q = exact[rng.choice(len(exact), size=min(queries, len(exact)), replace=False)]
+
+    half = normalize(exact.astype(np.float16).astype(np.float32))
+    int8 = normalize(np.stack([dequantize_int8(*quantize_int8(v)) for v in exact]))
+
+    print(f"{len(exact)} vectors, dim={dim}, {len(q)} queries, recall@{k}")
+    print(f"{'format':<10}{'bytes/vector':>14}{'recall':>10}")
+    print(f"{'float32':<10}{4 * dim + 8:>14}{1.0:>10.4f}")
+    print(f"{'halfvec':<10}{2 * dim + 8:>14}{recall_at_k(exact, half, q, k):>10.4f}")
+    print(f"{'int8':<10}{dim + 4:>14}{recall_at_k(exact, int8, q, k):>10.4f}")
+
+    sizes = await relation_sizes()
+    print(f"\nCurrent storage ({settings.EMBEDDING_STORAGE}): "
+          f"table {sizes['table_bytes'] / 1e6:.1f} MB, ANN index {sizes['index_bytes'] / 1e6:.1f} MB")
+
+
+async def migrate(target: str, lists: int):
+    dim = settings.EMBEDDING_DIM
+    sql_type = embedding_sql_type(target)
+    ops = embedding_cosine_ops(target)
+    before = await relation_sizes()
+
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX IF EXISTS idx_memories_embedding"))
+        # Rewrites every row, converting existing vectors to the new type
+        await conn.execute(text(
+            f"ALTER TABLE memories ALTER COLUMN embedding TYPE {sql_type}({dim}) "
+            f"USING embedding::{sql_type}({dim})"
+        ))
+        await conn.execute(text(
+            f"CREATE INDEX idx_memories_embedding ON memories "
+            f"USING ivfflat (embedding {ops}) WITH (lists = {lists})"
+        ))
+        await conn.execute(text("ANALYZE memories"))
+
+    after = await relation_sizes()
+    print(f"memories.embedding is now {sql_type}({dim}) with a {ops} index")
+    print(f"table: {before['table_bytes'] / 1e6:.1f} MB -> {after['table_bytes'] / 1e6:.1f} MB, "
+          f"index: {before['index_bytes'] / 1e6:.1f} MB -> {after['index_bytes'] / 1e6:.1f} MB")
+    print(f"Set EMBEDDING_STORAGE={target} before restarting the API")
+
+
+async def reindex(lists: int):
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(text(
+            "SELECT count(*) FROM memories WHERE embedding IS NOT NULL"
+        ))).scalar_one()
+    if not lists:
+        lists = max(10, rows // 1000 if rows <= 1_000_000 else int(rows ** 0.5))
+
+    ops = embedding_cosine_ops()
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX IF EXISTS idx_memories_embedding"))
+        await conn.execute(text(
+            f"CREATE INDEX idx_memories_embedding ON memories "
+            f"USING ivfflat (embedding {ops}) WITH (lists = {lists})"
+        ))
+        await conn.execute(text("ANALYZE memories"))
+    print(f"Rebuilt idx_memories_embedding over {rows} vectors with lists = {lists}; "
+          f"IVFFLAT_PROBES={settings.IVFFLAT_PROBES}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    report_parser = sub.add_parser("report", help="recall-vs-size report")
+    report_parser.add_argument("--sample", type=int, default=2000)
+    report_parser.add_argument("--queries", type=int, default=200)
+    report_parser.add_argument("--k", type=int, default=10)
+
+    migrate_parser = sub.add_parser("migrate", help="convert memories.embedding storage")
+    migrate_parser.add_argument("--to", choices=list(STORAGE_TYPES), required=True)
+    migrate_parser.add_argument("--lists", type=int, default=100)
+
+    reindex_parser = sub.add_parser("reindex", help="rebuild the ivfflat index from current data")
+    reindex_parser.add_argument("--lists", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "report":
+        asyncio.run(report(args.sample, args.k, args.queries))
+    elif args.command == "migrate":
+        asyncio.run(migrate(args.to, args.lists))
+    else:
+        asyncio.run(reindex(args.lists))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Backfill and verify integer SimHashes
+
+Run from the api/ directory:
+
+    python -m scripts.simhash backfill [--batch 5000]
+    python -m scripts.simhash verify [--sample 2000]
+    python -m scripts.simhash benchmark [--sizes 10000 1000000] [--sql]
+
+`backfill` fills memories.simhash_int from the existing hex simhash
+strings in SQL ('x' || hex)::bit(64)::bigint, which is the same signed
+64-bit value app.core.simhash.simhash_to_int produces, then copies it to
+memories.fingerprint (the upsert key) for one row per exact duplicate group.
+
+`verify` recomputes SimHashes for a sample of stored memories with the
+vectorized implementation and checks them against both stored columns.
+
+`benchmark` compares near-duplicate lookup (Hamming distance <= 3) by a
+full scan of a user's corpus against band probes, at each corpus size:
+in-process with numpy by default, and with --sql against a temporary
+Postgres table carrying the same band expression indexes as memories.
+Half of the queries are near duplicates of stored hashes, half random;
+both methods must return the same matches.
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from sqlalchemy import select, text
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import Memory
+from app.core.simhash import (
+    compute_simhashes, simhash_to_hex, SIMHASH_BANDS, SIMHASH_BAND_BITS
+)
+
+MAX_DISTANCE = 3
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+async def backfill(batch: int):
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(text("""
+                UPDATE memories
+                SET simhash_int = ('x' || simhash)::bit(64)::bigint
+                WHERE id IN (
+                    SELECT id FROM memories
+                    WHERE simhash_int IS NULL AND simhash ~ '^[0-9a-f]{16}$'
+                    LIMIT :batch
+                )
+            """), {"batch": batch})
+            await session.commit()
+        if result.rowcount == 0:
+            break
+        total += result.rowcount
+        print(f"backfilled {total} rows")
+    print(f"Done: {total} rows now have an integer SimHash")
+
+    # Fingerprints only go on the most salient active row of each exact
+    # duplicate group, so the unique upsert index is never violated
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(text("""
+                UPDATE memories
+                SET fingerprint = simhash_int
+                WHERE id IN (
+                    SELECT DISTINCT ON (owner_id, user_id, simhash_int) id FROM memories AS m
+                    WHERE is_active = true AND fingerprint IS NULL AND simhash_int IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM memories AS o
+                          WHERE o.is_active = true AND o.owner_id = m.owner_id
+                            AND o.user_id = m.user_id AND o.fingerprint = m.simhash_int
+                      )
+                    ORDER BY owner_id, user_id, simhash_int, salience DESC
+                    LIMIT :batch
+                )
+            """), {"batch": batch})
+            await session.commit()
+        if result.rowcount == 0:
+            break
+        total += result.rowcount
+        print(f"fingerprinted {total} rows")
+    print(f"Done: {total} rows now have a fingerprint")
+
+
+async def verify(sample: int):
+    async with AsyncSessionLocal() as session:
+        stmt = select(Memory.content, Memory.simhash, Memory.simhash_int).where(
+            Memory.simhash.isnot(None)
+        ).limit(sample)
+        rows = (await session.execute(stmt)).all()
+
+    computed = compute_simhashes([row.content for row in rows])
+    hex_mismatches = sum(1 for row, h in zip(rows, computed) if simhash_to_hex(h) != row.simhash)
+    int_mismatches = sum(
+        1 for row, h in zip(rows, computed) if row.simhash_int is not None and row.simhash_int != h
+    )
+    missing = sum(1 for row in rows if row.simhash_int is None)
+    print(f"{len(rows)} memories checked: {hex_mismatches} hex mismatches, "
+          f"{int_mismatches} integer mismatches, {missing} not backfilled")
+
+
+def make_queries(stored: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Near duplicates (1-3 flipped bits) of stored hashes, then random hashes"""
+    near = stored[rng.choice(len(stored), size=count // 2)].copy()
+    for i in range(len(near)):
+        for bit in rng.choice(64, size=rng.integers(1, MAX_DISTANCE + 1), replace=False):
+            near[i] ^= np.uint64(1) << np.uint64(bit)
+    far = rng.integers(0, 2**64, size=count - len(near), dtype=np.uint64)
+    return np.concatenate([near, far])
+
+
+def distances(stored: np.ndarray, h: np.uint64) -> np.ndarray:
+    return _POPCOUNT[(stored ^ h).view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def bands_of(values: np.ndarray, band: int) -> np.ndarray:
+    mask = np.uint64((1 << SIMHASH_BAND_BITS) - 1)
+    return (values >> np.uint64(SIMHASH_BAND_BITS * band)) & mask
+
+
+def benchmark_memory(size: int, queries: int):
+    rng = np.random.default_rng(size)
+    stored = rng.integers(0, 2**64, size=size, dtype=np.uint64)
+    probes = make_queries(stored, queries, rng)
+
+    start = time.perf_counter()
+    scan_matches = [set(np.nonzero(distances(stored, h) <= MAX_DISTANCE)[0]) for h in probes]
+    scan_ms = (time.perf_counter() - start) * 1000 / len(probes)
+
+    # Sorted band columns stand in for the per-band btree indexes
+    start = time.perf_counter()
+    index = []
+    for band in range(SIMHASH_BANDS):
+        values = bands_of(stored, band)
+        order = np.argsort(values, kind="stable")
+        index.append((values[order], order))
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    band_matches = []
+    examined = 0
+    for h in probes:
+        candidates = set()
+        for band, (values, order) in enumerate(index):
+            key = bands_of(np.array([h]), band)[0]
+            lo, hi = np.searchsorted(values, key, "left"), np.searchsorted(values, key, "right")
+            candidates.update(order[lo:hi].tolist())
+        examined += len(candidates)
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        band_matches.append(set(ids[distances(stored[ids], h) <= MAX_DISTANCE]) if len(ids) else set())
+    band_ms = (time.perf_counter() - start) * 1000 / len(probes)
+
+    found = sum(len(m) for m in scan_matches)
+    missed = sum(len(a - b) for a, b in zip(scan_matches, band_matches))
+    print(f"{size:>9} {'memory':<7}{scan_ms:>11.3f}{band_ms:>11.3f}"
+          f"{examined / len(probes):>13.1f}{found:>8}{missed:>8}   (index build {build_s:.2f}s)")
+
+
+async def benchmark_sql(size: int, queries: int):
+    rng = np.random.default_rng(size)
+    async with AsyncSessionLocal() as session:
+        await session.execute(text("DROP TABLE IF EXISTS simhash_bench"))
+        await session.execute(text("""
+            CREATE TEMP TABLE simhash_bench AS
+            SELECT g AS id, ('x' || substr(md5(g::text), 1, 16))::bit(64)::bigint AS simhash_int
+            FROM generate_series(1, :size) AS g
+        """), {"size": size})
+        for band in range(SIMHASH_BANDS):
+            await session.execute(text(
+                f"CREATE INDEX ON simhash_bench "
+                f"(((simhash_int >> {SIMHASH_BAND_BITS * band}) & 65535))"
+            ))
+        await session.execute(text("ANALYZE simhash_bench"))
+
+        sample = (await session.execute(text(
+            "SELECT simhash_int FROM simhash_bench ORDER BY random() LIMIT :n"
+        ), {"n": queries})).scalars().all()
+        stored = np.array(sample, dtype=np.int64).view(np.uint64)
+        probes = make_queries(stored, queries, rng).view(np.int64).tolist()
+
+        band_filter = " OR ".join(
+            f"((simhash_int >> {SIMHASH_BAND_BITS * band}) & 65535) = "
+            f"((CAST(:h AS bigint) >> {SIMHASH_BAND_BITS * band}) & 65535)"
+            for band in range(SIMHASH_BANDS)
+        )
+        distance = "bit_count((simhash_int # CAST(:h AS bigint))::bit(64))"
+        scan_sql = text(f"SELECT id FROM simhash_bench WHERE {distance} <= {MAX_DISTANCE}")
+        band_sql = text(f"SELECT id FROM simhash_bench WHERE ({band_filter}) AND {distance} <= {MAX_DISTANCE}")
+
+        timings = {}
+        results = {}
+        for name, stmt in (("scan", scan_sql), ("bands", band_sql)):
+            start = time.perf_counter()
+            results[name] = [set((await session.execute(stmt, {"h": h})).scalars().all()) for h in probes]
+            timings[name] = (time.perf_counter() - start) * 1000 / len(probes)
+        await session.execute(text("DROP TABLE simhash_bench"))
+
+    found = sum(len(m) for m in results["scan"])
+    missed = sum(len(a - b) for a, b in zip(results["scan"], results["bands"]))
+    print(f"{size:>9} {'sql':<7}{timings['scan']:>11.3f}{timings['bands']:>11.3f}"
+          f"{'-':>13}{found:>8}{missed:>8}")
+
+
+def benchmark(sizes: list, queries: int, sql: bool):
+    print(f"Hamming distance <= {MAX_DISTANCE}, {SIMHASH_BANDS} bands of {SIMHASH_BAND_BITS} bits, "
+          f"{queries} queries per size (ms per query)")
+    print(f"{'memories':>9} {'mode':<7}{'scan ms':>11}{'bands ms':>11}"
+          f"{'examined':>13}{'found':>8}{'missed':>8}")
+    for size in sizes:
+        benchmark_memory(size, queries)
+        if sql:
+            asyncio.run(benchmark_sql(size, queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = sub.add_parser("backfill", help="fill simhash_int for existing rows")
+    backfill_parser.add_argument("--batch", type=int, default=5000)
+
+    verify_parser = sub.add_parser("verify", help="recompute SimHashes and compare with stored values")
+    verify_parser.add_argument("--sample", type=int, default=2000)
+
+    benchmark_parser = sub.add_parser("benchmark", help="full scan vs band probes for near duplicates")
+    benchmark_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    benchmark_parser.add_argument("--queries", type=int, default=200)
+    benchmark_parser.add_argument("--sql", action="store_true", help="also benchmark in Postgres")
+
+    args = parser.parse_args()
+    if args.command == "backfill":
+        asyncio.run(backfill(args.batch))
+    elif args.command == "verify":
+        asyncio.run(verify(args.sample))
+    else:
+        benchmark(args.sizes, args.queries, args.sql)
+
+
+if __name__ == "__main__":
+    main()
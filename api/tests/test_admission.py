@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.admission import AdmissionPool, Overloaded, provider_retry_after
+
+
+def make_pool(max_concurrent: int = 1, max_queue: int = 2) -> AdmissionPool:
+    return AdmissionPool("test", max_concurrent=max_concurrent, max_queue=max_queue, retry_after=7.0)
+
+
+async def hold(pool: AdmissionPool, priority: str, order: list, release: asyncio.Event):
+    async with pool.slot(priority):
+        order.append(priority)
+        await release.wait()
+
+
+def test_search_waiters_are_served_before_ingest():
+    pool = make_pool(max_concurrent=1, max_queue=5)
+
+    async def scenario():
+        order = []
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(pool, "ingest", order, release))
+        await asyncio.sleep(0)
+
+        # Queued in arrival order ingest, search, ingest, search
+        waiters = [
+            asyncio.create_task(hold(pool, priority, order, release))
+            for priority in ("ingest", "search", "ingest", "search")
+        ]
+        await asyncio.sleep(0)
+        assert pool.stats()["waiting"] == {"search": 2, "ingest": 2}
+
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return order
+
+    assert asyncio.run(scenario()) == ["ingest", "search", "search", "ingest", "ingest"]
+    assert pool.active == 0
+    assert pool.admitted == {"search": 2, "ingest": 3}
+
+
+def test_full_queue_rejects_with_overloaded():
+    pool = make_pool(max_concurrent=1, max_queue=1)
+
+    async def scenario():
+        order = []
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(hold(pool, "ingest", order, release)) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(Overloaded) as excinfo:
+            async with pool.slot("ingest"):
+                pass
+
+        # The search queue is separate and still has room
+        tasks.append(asyncio.create_task(hold(pool, "search", order, release)))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+        return excinfo.value
+
+    error = asyncio.run(scenario())
+    assert error.pool == "test"
+    assert error.status_code == 503
+    assert error.retry_after == 7.0
+    assert pool.rejected == {"search": 0, "ingest": 1}
+    assert pool.active == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    pool = make_pool(max_concurrent=1, max_queue=1)
+
+    async def scenario():
+        order = []
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(pool, "ingest", order, release))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold(pool, "ingest", order, release))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert pool.waiting == 0
+
+        release.set()
+        await holder
+        return order
+
+    assert asyncio.run(scenario()) == ["ingest"]
+    assert pool.active == 0
+
+
+def test_provider_retry_after():
+    def error(headers):
+        return SimpleNamespace(response=SimpleNamespace(headers=headers))
+
+    assert provider_retry_after(error({"retry-after": "12"}), 5.0) == 12.0
+    assert provider_retry_after(error({"retry-after": "soon"}), 5.0) == 5.0
+    assert provider_retry_after(error({}), 5.0) == 5.0
+    assert provider_retry_after(ValueError("no response"), 5.0) == 5.0
+
+    rate_limited = Overloaded("embeddings", 12.0, status_code=429)
+    assert rate_limited.status_code == 429
@@ -0,0 +1,94 @@
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", fake)
+    return fake
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+
+    clock.now += 5
+    assert cache.get("a") == 1
+    assert cache.get("b") is None  # Expires at exactly its ttl
+
+    clock.now += 55
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_non_positive_ttl_is_not_stored(clock):
+    cache = TTLCache(max_entries=10, ttl_seconds=0)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=-1)
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+
+    cache.set("c", 3, ttl=1)
+    assert cache.get("c") == 3
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_byte_bound_evicts_until_under_limit(clock):
+    cache = TTLCache(max_entries=100, ttl_seconds=60, max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "yyyy")
+    assert cache.bytes == 8
+
+    cache.set("c", "zzzzzz")
+    assert cache.get("a") is None
+    assert cache.get("b") == "yyyy"
+    assert cache.get("c") == "zzzzzz"
+    assert (cache.bytes, cache.evictions) == (10, 1)
+
+    # Replacing a key releases the old value's bytes
+    cache.set("c", "zz")
+    assert (cache.bytes, cache.evictions) == (6, 1)
+
+    # A value larger than the bound is not kept
+    cache.set("d", "x" * 11)
+    assert cache.get("d") is None
+    assert (cache.bytes, cache.evictions) == (0, 4)
+
+
+def test_invalidate_where_drops_matching_values(clock):
+    cache = TTLCache(max_entries=10, ttl_seconds=60, sizeof=lambda value: value[1])
+    cache.set("k1", ("user-1", 3))
+    cache.set("k2", ("user-2", 4))
+    cache.set("k3", ("user-1", 5))
+
+    assert cache.invalidate_where(lambda value: value[0] == "user-1") == 2
+    assert cache.get("k1") is None
+    assert cache.get("k3") is None
+    assert cache.get("k2") == ("user-2", 4)
+    assert cache.bytes == 4
+    assert cache.invalidate_where(lambda value: value[0] == "user-1") == 0
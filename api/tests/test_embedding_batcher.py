@@ -0,0 +1,103 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from app.core.embedding_batcher import EmbeddingBatcher
+
+
+class FakeBackend:
+    """Embeds a text as [len(text)] and records each provider call"""
+
+    def __init__(self, error: Exception = None):
+        self.calls: List[List[str]] = []
+        self.error = error
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        return [[float(len(text))] for text in texts]
+
+
+def test_full_batch_flushes_without_waiting():
+    backend = FakeBackend()
+    batcher = EmbeddingBatcher(backend.embed_many, max_batch=3, max_wait_ms=60_000)
+
+    async def scenario():
+        return await asyncio.wait_for(asyncio.gather(
+            batcher.embed_many(["a"]),
+            batcher.embed_many(["bb", "ccc"]),
+        ), timeout=1.0)
+
+    assert asyncio.run(scenario()) == [[[1.0]], [[2.0], [3.0]]]
+    assert backend.calls == [["a", "bb", "ccc"]]
+
+
+def test_partial_batch_flushes_after_max_wait():
+    backend = FakeBackend()
+    batcher = EmbeddingBatcher(backend.embed_many, max_batch=100, max_wait_ms=20)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(batcher.embed_many(["a"]), batcher.embed_many(["bb"]))
+        return results, loop.time() - start
+
+    results, elapsed = asyncio.run(scenario())
+    assert results == [[[1.0]], [[2.0]]]
+    assert backend.calls == [["a", "bb"]]
+    assert elapsed >= 0.015
+    assert batcher.stats()["pending"] == 0
+
+
+def test_results_fan_out_to_each_caller_in_order():
+    backend = FakeBackend()
+    batcher = EmbeddingBatcher(backend.embed_many, max_batch=4, max_wait_ms=10)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.embed_many(["same", "x"]),
+            batcher.embed_many(["same"]),
+            batcher.embed_many(["longer", "same", "yy"]),
+        )
+
+    assert asyncio.run(scenario()) == [
+        [[4.0], [1.0]],
+        [[4.0]],
+        [[6.0], [4.0], [2.0]],
+    ]
+    # Size flush at four texts, then the remainder on the timer; duplicates sent once
+    assert backend.calls == [["same", "x", "longer"], ["same", "yy"]]
+    assert batcher.stats()["batches"] == 2
+
+
+def test_provider_error_reaches_every_waiter():
+    backend = FakeBackend(error=RuntimeError("provider down"))
+    batcher = EmbeddingBatcher(backend.embed_many, max_batch=10, max_wait_ms=5)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.embed_many(["a"]),
+            batcher.embed_many(["b", "c"]),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert len(backend.calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert all(str(result) == "provider down" for result in results)
+
+
+def test_error_does_not_poison_later_batches():
+    backend = FakeBackend(error=RuntimeError("provider down"))
+    batcher = EmbeddingBatcher(backend.embed_many, max_batch=1, max_wait_ms=5)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await batcher.embed_many(["a"])
+        backend.error = None
+        return await batcher.embed_many(["bb"])
+
+    assert asyncio.run(scenario()) == [[2.0]]
@@ -0,0 +1,33 @@
+from app.core.prefilter import classify
+
+
+def test_rejects_greetings_and_noise():
+    assert classify("hey there, how are you?") is not None
+    assert classify("hahaha ok thanks") is not None
+    assert classify("🙂👍 ...") is not None
+    assert classify("   ") is not None
+
+
+def test_passes_non_latin_text():
+    assert classify("Меня зовут Анна, я живу в Берлине") is None
+    assert classify("我喜欢喝绿茶") is None
+    assert classify("私は東京に住んでいます") is None
+    assert classify("привет") is None
+    assert classify("Ich heiße Jürgen") is None
+
+
+def test_passes_consonant_heavy_names():
+    assert classify("Schwartz") is None
+    assert classify("My name is Schwartz") is None
+    assert classify("Krzysztof") is None
+    assert classify("Strength") is None
+
+
+def test_rejects_clear_keyboard_mash():
+    assert classify("sdfghjkl") is not None
+    assert classify("aaaaaaa") is not None
+
+
+def test_passes_numbers_and_facts():
+    assert classify("ok 42") is None
+    assert classify("I prefer dark mode") is None
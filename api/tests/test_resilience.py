@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.core.resilience import CircuitBreaker, CircuitOpen, ResilientCaller
+
+
+def make_caller(breaker: CircuitBreaker) -> ResilientCaller:
+    return ResilientCaller(
+        name="test",
+        attempt_timeout=5.0,
+        max_attempts=1,
+        backoff_base=0.0,
+        backoff_max=0.0,
+        hedge=False,
+        hedge_min_samples=20,
+        breaker=breaker
+    )
+
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0.0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    return breaker
+
+
+def test_cancelled_trial_releases_half_open_circuit():
+    breaker = open_breaker()
+    caller = make_caller(breaker)
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(10)
+
+        trial = asyncio.create_task(caller.call(hang))
+        await started.wait()
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        async def ok():
+            return "ok"
+
+        return await caller.call(ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_concurrent_call_short_circuits_during_trial():
+    breaker = open_breaker()
+    caller = make_caller(breaker)
+
+    async def scenario():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await release.wait()
+            return "trial"
+
+        trial = asyncio.create_task(caller.call(slow))
+        await started.wait()
+
+        async def ok():
+            return "ok"
+
+        with pytest.raises(CircuitOpen):
+            await caller.call(ok)
+        release.set()
+        return await trial
+
+    assert asyncio.run(scenario()) == "trial"
+    assert breaker.state == "closed"
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+from sqlalchemy import column
+from sqlalchemy.dialects import postgresql
+
+from app.core.simhash import (
+    SIMHASH_BANDS, SIMHASH_BAND_BITS, canonical_token_set, compute_simhash, compute_simhashes,
+    hamming_distance, simhash_band_sql, simhash_bands, simhash_to_hex, simhash_to_int
+)
+
+
+def reference_simhash(text: str) -> str:
+    """The original scalar implementation (mirrors the Swift client)"""
+    hashes = []
+    for token in canonical_token_set(text):
+        h = 0
+        for char in token:
+            h = ((h << 5) - h + ord(char)) & 0xffffffff
+        hashes.append(h)
+
+    vec = [0] * 64
+    for h in hashes:
+        for i in range(64):
+            vec[i] += 1 if h & (1 << (i % 32)) else -1
+
+    bits = "".join("1" if v > 0 else "0" for v in vec)
+    return format(int(bits, 2), "016x")
+
+
+TEXTS = [
+    "",
+    "ok",
+    "User prefers dark mode in all editors",
+    "My name is Alice and I live in Berlin",
+    "my NAME is alice, and i live in berlin!!",
+    "Deploys go out every Tuesday at 10am from the release-2024 branch",
+    "zzz " * 50,
+    "abc def ghi",  # Three tokens, no ties possible
+    "abcd abce",  # Two tokens, ties on agreeing bits
+]
+
+
+def test_vectorized_matches_reference():
+    rng = random.Random(7)
+    words = ["memory", "vector", "alice", "berlin", "tuesday", "x9z", "a1b2c3", "deploy", "the"]
+    texts = TEXTS + [" ".join(rng.choices(words, k=rng.randint(0, 12))) for _ in range(200)]
+
+    computed = compute_simhashes(texts)
+    assert [simhash_to_hex(h) for h in computed] == [reference_simhash(t) for t in texts]
+    assert all(-(1 << 63) <= h < (1 << 63) for h in computed)
+
+
+def test_known_hashes():
+    assert compute_simhash("") == "0000000000000000"
+    assert compute_simhash("User prefers dark mode in all editors") == "c5940400c5940400"
+    assert compute_simhash("My name is Alice and I live in Berlin") == "414dcc00414dcc00"
+    assert simhash_to_int("c5940400c5940400") == compute_simhashes(["User prefers dark mode in all editors"])[0]
+
+
+def test_hamming_distance():
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(-1, 0) == 64  # Signed BIGINT form
+    assert hamming_distance("c5940400c5940400", "c5940400c5940401") == 1
+    assert hamming_distance("c5940400c5940400", simhash_to_int("c5940400c5940400")) == 0
+    assert hamming_distance("c594", "c5940400c5940400") == 64  # Length mismatch
+
+
+@pytest.mark.parametrize("h", [0, 1, -1, simhash_to_int("c5940400c5940400"), (1 << 63) - 1, -(1 << 63)])
+def test_bands_reassemble_hash(h):
+    bands = simhash_bands(h)
+    assert len(bands) == SIMHASH_BANDS
+    assert all(0 <= band < (1 << SIMHASH_BAND_BITS) for band in bands)
+    unsigned = sum(band << (SIMHASH_BAND_BITS * k) for k, band in enumerate(bands))
+    assert unsigned == h & ((1 << 64) - 1)
+
+
+def test_near_duplicates_share_a_band():
+    rng = random.Random(3)
+    for _ in range(500):
+        h = rng.getrandbits(64)
+        near = h
+        for bit in rng.sample(range(64), 3):
+            near ^= 1 << bit
+        assert any(a == b for a, b in zip(simhash_bands(h), simhash_bands(near)))
+
+
+def test_band_sql_matches_band_shifts():
+    dialect = postgresql.dialect()
+    for band in range(SIMHASH_BANDS):
+        sql = str(simhash_band_sql(column("simhash_int"), band).compile(dialect=dialect))
+        assert sql == f"(simhash_int >> {SIMHASH_BAND_BITS * band}) & 65535"